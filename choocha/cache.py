@@ -0,0 +1,34 @@
+# choocha\cache.py
+from django.core.cache.backends.redis import RedisCache
+
+from .middleware import current_stats
+
+_missing = object()
+
+
+class InstrumentedRedisCache(RedisCache):
+    """
+    RedisCache, считающий попадания и промахи чтений в счётчиках текущего HTTP-запроса
+    (choocha.middleware.RequestStats). Асинхронные aget/aget_many базового класса вызывают
+    эти же методы. Вне запроса, замеряемого PerformanceMiddleware или QueryBudgetMiddleware,
+    остаётся одна проверка переменной контекста.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        stats = current_stats()
+        if stats is not None:
+            if value is _missing:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        stats = current_stats()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
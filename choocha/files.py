@@ -0,0 +1,181 @@
+# choocha\files.py
+import mimetypes
+import os
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Имена, которые ManifestStaticFilesStorage дополняет хэшем содержимого: styles.3f2a1b9c0d1e.css
+HASHED_NAME = re.compile(r'^(?P<stem>.+)\.[0-9a-f]{12}(?P<suffix>\.[^./]+)$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Сжатые заранее варианты: (значение Content-Encoding, расширение файла) в порядке предпочтения
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+ENCODING_CONTENT_TYPES = {
+    'br': 'application/x-brotli',
+    'bzip2': 'application/x-bzip',
+    'compress': 'application/x-compress',
+    'gzip': 'application/gzip',
+    'xz': 'application/x-xz',
+}
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _resolve(document_root, path: str) -> Path:
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = Path(safe_join(document_root, path))
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if fullpath.is_file():
+        return fullpath
+    # Файл из STATIC_ROOT, не прошедший collectstatic, получает в манифесте вычисленное имя,
+    # но копии с хэшем на диске нет. Хэш посчитан по этому же содержимому, так что отдаём оригинал
+    match = HASHED_NAME.match(fullpath.name)
+    if match and (original := fullpath.with_name(match['stem'] + match['suffix'])).is_file():
+        return original
+    raise Http404('Файл не найден')
+
+
+def _content_type(path: Path) -> str:
+    content_type, encoding = mimetypes.guess_type(path)
+    return ENCODING_CONTENT_TYPES.get(encoding, content_type) or 'application/octet-stream'
+
+
+def _accepted_encodings(header: str) -> dict[str, float]:
+    """Кодирования из Accept-Encoding с их весом q: 'gzip;q=0.5, br' -> {'gzip': 0.5, 'br': 1.0}."""
+    accepted = {}
+    for item in header.split(','):
+        token, *params = (part.strip() for part in item.split(';'))
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token.lower()] = q
+    return accepted
+
+
+def _is_accepted(encoding: str, accepted: dict[str, float]) -> bool:
+    # Явный вес кодирования важнее веса "*"
+    return accepted.get(encoding, accepted.get('*', 0.0)) > 0
+
+
+def _pick_encoding(request, fullpath: Path) -> tuple[Path, str | None, bool]:
+    """Возвращает файл для отдачи, его Content-Encoding и признак наличия сжатых вариантов."""
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    has_variants = False
+    for encoding, extension in PRECOMPRESSED:
+        variant = fullpath.with_name(fullpath.name + extension)
+        if variant.is_file():
+            has_variants = True
+            if _is_accepted(encoding, accepted) and 'Range' not in request.headers:
+                return variant, encoding, True
+    return fullpath, None, has_variants
+
+
+class _RangeNotSatisfiable(Exception):
+    pass
+
+
+def _parse_range(request, size: int, etag: str, mtime: float) -> tuple[int, int] | None:
+    """Один диапазон из заголовка Range; None - отдать файл целиком."""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # Несколько диапазонов или неверный синтаксис: отдаём целиком
+    start, end = match.groups()
+    if start == '':
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise _RangeNotSatisfiable
+    return start, end
+
+
+def _read_range(fullpath: Path, start: int, length: int):
+    with fullpath.open('rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_file(request, path: str, document_root, accel_location: str | None = None):
+    """
+    Отдача файлов из MEDIA_ROOT и STATIC_ROOT вместо django.views.static.serve.
+    Поддерживает сильные ETag, If-None-Match/If-Modified-Since, одиночные Range-запросы,
+    заранее сжатые .br/.gz варианты и вечное кэширование имён с хэшем.
+    При FILES_SENDFILE_BACKEND = 'nginx' или 'xsendfile' сама передача файла отдаётся веб-серверу.
+    """
+    original = _resolve(document_root, path)
+    content_type = _content_type(original)
+    fullpath, encoding, has_variants = _pick_encoding(request, original)
+    stat = fullpath.stat()
+    # Размер и время изменения до наносекунд меняются вместе с содержимым; вариант кодирования - тоже
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        backend = settings.FILES_SENDFILE_BACKEND
+        if backend == 'nginx' and accel_location:
+            response = HttpResponse(content_type=content_type)
+            relative = fullpath.relative_to(os.path.abspath(document_root)).as_posix()
+            # Заголовки с не-latin-1 символами Django кодирует по RFC 2047, и веб-сервер не нашёл бы
+            # файл "Снимок.png". Nginx и mod_xsendfile (XSendFileUnescape) раскодируют %-последовательности
+            response['X-Accel-Redirect'] = accel_location + quote(relative)
+        elif backend == 'xsendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = quote(fullpath.as_posix())
+        else:
+            try:
+                byte_range = _parse_range(request, stat.st_size, etag, stat.st_mtime)
+            except _RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+            if byte_range is None:
+                response = FileResponse(fullpath.open('rb'), content_type=content_type)
+            else:
+                start, end = byte_range
+                response = StreamingHttpResponse(_read_range(fullpath, start, end - start + 1),
+                                                 status=206, content_type=content_type)
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+                response['Content-Length'] = str(end - start + 1)
+            response['Accept-Ranges'] = 'bytes'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    if has_variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if HASHED_NAME.match(Path(path).name)
+        else f'public, max-age={settings.FILES_MAX_AGE}'
+    )
+    return response
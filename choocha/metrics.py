@@ -0,0 +1,132 @@
+# choocha\metrics.py
+"""
+Метрики HTTP-запросов в памяти процесса (их собирает choocha.middleware.PerformanceMiddleware)
+и их выдача в текстовом формате Prometheus.
+Каждый процесс gunicorn/uvicorn хранит свои счётчики: Prometheus должен опрашивать
+процессы по отдельности либо суммировать их с меткой instance.
+"""
+import hmac
+import math
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, Http404
+
+# Границы гистограммы длительности запроса, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, math.inf)
+
+
+class ViewMetrics:
+    __slots__ = ('buckets', 'duration', 'queries', 'db_time', 'cache_hits', 'cache_misses',
+                 'template_time', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)  # не накопительные, суммируются при выдаче
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.response_bytes = 0
+
+    def copy(self) -> 'ViewMetrics':
+        copy = ViewMetrics()
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.buckets = list(self.buckets)
+        return copy
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views: dict[str, ViewMetrics] = {}
+        self._responses: dict[tuple[str, str, int], int] = {}
+
+    def observe(self, view: str, method: str, status: int, duration: float, stats, size: int) -> None:
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.buckets[bisect_left(DURATION_BUCKETS, duration)] += 1
+            metrics.duration += duration
+            metrics.queries += stats.queries
+            metrics.db_time += stats.duration
+            metrics.cache_hits += stats.cache_hits
+            metrics.cache_misses += stats.cache_misses
+            metrics.template_time += stats.template_time
+            metrics.response_bytes += size
+            key = (view, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._views.clear()
+            self._responses.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            views = sorted((view, metrics.copy()) for view, metrics in self._views.items())
+            responses = sorted(self._responses.items())
+
+        lines = [
+            '# HELP choocha_metrics_sample_rate Доля запросов, попадающих в метрики',
+            '# TYPE choocha_metrics_sample_rate gauge',
+            f'choocha_metrics_sample_rate {settings.PERF_METRICS_SAMPLE_RATE}',
+            '# HELP choocha_http_responses_total Ответы по представлению, методу и статусу',
+            '# TYPE choocha_http_responses_total counter',
+        ]
+        for (view, method, status), count in responses:
+            lines.append(f'choocha_http_responses_total{{view="{escape(view)}",method="{method}",status="{status}"}} {count}')
+
+        lines += ['# HELP choocha_http_request_duration_seconds Время обработки запроса',
+                  '# TYPE choocha_http_request_duration_seconds histogram']
+        for view, metrics in views:
+            label, total = escape(view), 0
+            for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                total += count
+                le = '+Inf' if bound == math.inf else bound
+                lines.append(f'choocha_http_request_duration_seconds_bucket{{view="{label}",le="{le}"}} {total}')
+            lines.append(f'choocha_http_request_duration_seconds_sum{{view="{label}"}} {metrics.duration}')
+            lines.append(f'choocha_http_request_duration_seconds_count{{view="{label}"}} {total}')
+
+        counters = (
+            ('choocha_db_queries_total', 'Запросы к базе', 'queries'),
+            ('choocha_db_query_seconds_total', 'Время запросов к базе', 'db_time'),
+            ('choocha_template_render_seconds_total', 'Время рендера шаблонов TemplateResponse', 'template_time'),
+            ('choocha_http_response_bytes_total', 'Размер тел ответов', 'response_bytes'),
+        )
+        for name, description, attribute in counters:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+            lines += [f'{name}{{view="{escape(view)}"}} {getattr(metrics, attribute)}' for view, metrics in views]
+
+        lines += ['# HELP choocha_cache_requests_total Обращения к кэшу по результату',
+                  '# TYPE choocha_cache_requests_total counter']
+        for view, metrics in views:
+            lines.append(f'choocha_cache_requests_total{{view="{escape(view)}",result="hit"}} {metrics.cache_hits}')
+            lines.append(f'choocha_cache_requests_total{{view="{escape(view)}",result="miss"}} {metrics.cache_misses}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """
+    Метрики процесса для Prometheus, только с заголовком "Authorization: Bearer <PERF_METRICS_TOKEN>".
+    Без токена адрес не отвечает: за nginx все запросы приходят с 127.0.0.1, и проверка адреса не защищает.
+    """
+    token = settings.PERF_METRICS_TOKEN
+    if not token or not settings.PERF_METRICS_SAMPLE_RATE:
+        raise Http404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        raise Http404
+    response = HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,220 @@
+# choocha\middleware.py
+import contextvars
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Счётчики текущего HTTP-запроса. Переменная контекста видна и в потоках sync_to_async
+# асинхронных представлений, а вне запроса (команды, фоновые задачи) равна None
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    __slots__ = ('queries', 'duration', 'cache_hits', 'cache_misses', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0  # секунды запросов к базе
+        self.cache_hits = 0  # считает choocha.cache.InstrumentedRedisCache
+        self.cache_misses = 0
+        self.template_time = 0.0  # секунды рендера TemplateResponse, считает PerformanceMiddleware
+
+
+def current_stats() -> RequestStats | None:
+    return _current_stats.get()
+
+
+def start_stats() -> tuple[RequestStats, contextvars.Token | None]:
+    """Счётчики запроса: уже начатые внешним middleware или новые (тогда нужен reset токена)."""
+    stats = _current_stats.get()
+    if stats is not None:
+        return stats, None
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.duration += time.perf_counter() - started
+
+
+def install_query_counter(connection) -> None:
+    # Объект соединения живёт в своём потоке между запросами, обёртка ставится один раз
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs) -> None:
+    # Соединения потоков sync_to_async открываются уже внутри запроса
+    install_query_counter(connection)
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы к базе и их время за весь HTTP-запрос, включая рендер шаблонов
+    и остальные middleware. При превышении QUERY_BUDGET_QUERIES или QUERY_BUDGET_DB_TIME
+    пишет предупреждение, а с QUERY_BUDGET_RAISE - бросает QueryBudgetExceeded,
+    чтобы N+1 в представлениях и тегах шаблонов ронял тесты.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_QUERIES is None and settings.QUERY_BUDGET_DB_TIME is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path.startswith(settings.QUERY_BUDGET_EXEMPT):
+            return self.get_response(request)
+        # Соединение, открытое до подключения обработчика сигнала (например, тестами), тоже считается
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+        # Под PerformanceMiddleware счётчики общие: он стоит раньше и запросов к базе не делает
+        stats, token = start_stats()
+        try:
+            response = self.get_response(request)
+            self.check(request, stats)
+        finally:
+            if token is not None:
+                _current_stats.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        if request.path.startswith(settings.QUERY_BUDGET_EXEMPT):
+            return await self.get_response(request)
+        stats, token = start_stats()
+        try:
+            response = await self.get_response(request)
+            self.check(request, stats)
+        finally:
+            if token is not None:
+                _current_stats.reset(token)
+        return response
+
+    @staticmethod
+    def check(request, stats: RequestStats) -> None:
+        max_queries, max_time = settings.QUERY_BUDGET_QUERIES, settings.QUERY_BUDGET_DB_TIME
+        duration = stats.duration * 1000
+        if (max_queries is None or stats.queries <= max_queries) and (max_time is None or duration <= max_time):
+            return
+        match = request.resolver_match
+        message = (f'{request.method} {request.path} ({match.view_name if match else "-"}): '
+                   f'{stats.queries} запросов к базе за {duration:.0f} мс, '
+                   f'бюджет {max_queries} запросов и {max_time} мс')
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class PerformanceMiddleware:
+    """
+    Замеры запроса для метрик процесса (choocha.metrics, выдаются по /metrics) и заголовка
+    Server-Timing (при PERF_SERVER_TIMING, только сотрудникам): время обработки, запросы к базе
+    и их время, обращения к кэшу, рендер TemplateResponse и размер ответа. В замер попадает
+    доля PERF_METRICS_SAMPLE_RATE запросов, при 0 middleware исключается из цепочки. Должен стоять первым в MIDDLEWARE,
+    чтобы рендер шаблонов шёл после обработчиков process_template_response остальных middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PERF_METRICS_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.server_timing = settings.PERF_SERVER_TIMING
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+        token = _current_stats.set(RequestStats())
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            stats, duration = _current_stats.get(), time.perf_counter() - started
+            self.record(request, response, stats, duration)
+            # Ответ, выданный до AuthenticationMiddleware (например, перенаправление на HTTPS), без пользователя
+            user = getattr(request, 'user', None)
+            if self.server_timing and user is not None and user.is_staff:
+                self.add_server_timing(response, stats, duration)
+        finally:
+            _current_stats.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        token = _current_stats.set(RequestStats())
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            stats, duration = _current_stats.get(), time.perf_counter() - started
+            self.record(request, response, stats, duration)
+            if self.server_timing and hasattr(request, 'auser') and (await request.auser()).is_staff:
+                self.add_server_timing(response, stats, duration)
+        finally:
+            _current_stats.reset(token)
+        return response
+
+    def process_template_response(self, request, response):
+        stats = _current_stats.get()
+        if stats is not None:
+            # Обработчик последнего в цепочке middleware: рендер здесь совпадает с рендером обработчика Django
+            started = time.perf_counter()
+            response.render()
+            stats.template_time += time.perf_counter() - started
+        return response
+
+    @staticmethod
+    def record(request, response, stats: RequestStats, duration: float) -> None:
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(view, request.method, response.status_code, duration, stats, size)
+
+    @staticmethod
+    def add_server_timing(response, stats: RequestStats, duration: float) -> None:
+        # Заголовок раскрывает число и время запросов к базе, поэтому его видят только сотрудники.
+        # Страница из кэша AnonymousPageCacheMiddleware им не выдаётся, и заголовок в кэш не попадает
+        timings = (
+            f'app;dur={duration * 1000:.1f}',
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'cache;desc="{stats.cache_hits} hit, {stats.cache_misses} miss"',
+        )
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join((existing, *timings) if existing else timings)
@@ -2,12 +2,20 @@
 from django.http import HttpResponse
 from django.views.decorators.http import require_GET
 
+ROBOTS_LINES = [
+    "User-agent: *",
+    "Allow: /",
+    "Disallow: /admin/",
+    "Sitemap: https://choocha.ru/sitemap.xml",
+]
+
+
 @require_GET
 def robots_txt(request):
-    lines = [
-        "User-agent: *",
-        "Allow: /",
-        "Disallow: /admin/",
-        "Sitemap: https://choocha.ru/sitemap.xml",
-    ]
-    return HttpResponse("\n".join(lines), content_type="text/plain")
\ No newline at end of file
+    return HttpResponse("\n".join(ROBOTS_LINES), content_type="text/plain")
+
+
+@require_GET
+async def arobots_txt(request):
+    # Для ASGI: без перехода в поток синхронного представления
+    return HttpResponse("\n".join(ROBOTS_LINES), content_type="text/plain")
\ No newline at end of file
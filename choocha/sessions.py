@@ -0,0 +1,110 @@
+# choocha\sessions.py
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends import cache as cache_backend
+from django.contrib.sessions.backends import db as db_backend
+from django.utils import timezone
+
+# Время последнего продления срока сессии, хранится в самой сессии
+REFRESHED_KEY = '_session_refreshed_at'
+
+
+class SessionStore(cache_backend.SessionStore):
+    """
+    Сессии в Redis (CACHES['default']) вместо таблицы django_session.
+
+    Запись пропускается, если данные сессии не изменились, а срок продлевается не чаще
+    раза в SESSION_REFRESH_INTERVAL секунд. При SESSION_WRITE_THROUGH сессии дублируются
+    в базу: после очистки Redis сессия поднимается из django_session и снова кладётся в кэш.
+    """
+    cache_key_prefix = 'choocha.sessions:'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_digest = None
+
+    def _digest(self, data: dict) -> str:
+        return hashlib.md5(self.serializer().dumps(data)).hexdigest()
+
+    @staticmethod
+    def _refresh_due(data: dict) -> bool:
+        return time.time() - data.get(REFRESHED_KEY, 0) >= settings.SESSION_REFRESH_INTERVAL
+
+    def _load_from_db(self, session_key: str) -> dict:
+        store = db_backend.SessionStore(session_key)
+        session = store._get_session_from_db()
+        if session is None:
+            return {}
+        data = store.decode(session.session_data)
+        timeout = int((session.expire_date - timezone.now()).total_seconds())
+        if data and timeout > 0:
+            self._session_key = session_key
+            self._cache.set(self.cache_key, data, timeout)
+            return data
+        return {}
+
+    def load(self):
+        session_key = self.session_key
+        data = super().load()
+        if not data and session_key and settings.SESSION_WRITE_THROUGH:
+            data = self._load_from_db(session_key)
+        self._loaded_digest = self._digest(data) if data else None
+        if data and self._refresh_due(data):
+            # Данные те же, но срок в кэше пора продлить: SessionMiddleware сохранит сессию
+            self.modified = True
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if not must_create and self._loaded_digest == self._digest(data) and not self._refresh_due(data):
+            return
+        data[REFRESHED_KEY] = time.time()
+        super().save(must_create=must_create)
+        if settings.SESSION_WRITE_THROUGH:
+            self._save_to_db(data)
+        self._loaded_digest = self._digest(data)
+
+    def _save_to_db(self, data: dict) -> None:
+        store = db_backend.SessionStore(self.session_key)
+        store._session_cache = data
+        # Без force_insert/force_update: строки может не быть, если сессия создана до включения дублирования
+        store.create_model_instance(data).save()
+
+    def exists(self, session_key):
+        return super().exists(session_key) or (
+            settings.SESSION_WRITE_THROUGH and db_backend.SessionStore().exists(session_key)
+        )
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key and settings.SESSION_WRITE_THROUGH:
+            db_backend.SessionStore().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        # Просроченные ключи Redis удаляет сам, в базе остаются только дубли
+        if settings.SESSION_WRITE_THROUGH:
+            db_backend.SessionStore.clear_expired()
+
+    # Асинхронные методы базового класса обходят логику выше
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    async def aclear_expired(cls):
+        return await sync_to_async(cls.clear_expired)()
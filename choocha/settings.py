@@ -40,11 +40,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'notes.apps.NotesConfig',
     'users.apps.UsersConfig',
     'social_django',
     'django_ckeditor_5',
-    'debug_toolbar',
     'django.contrib.sites',
     'django.contrib.sitemaps',
     'analytical',
@@ -53,7 +53,9 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'choocha.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'choocha.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # "django.middleware.cache.UpdateCacheMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -62,9 +64,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'notes.middleware.AnonymousPageCacheMiddleware',
 ]
 
+# Панель отладки только при разработке; в работе замеры даёт choocha.middleware.PerformanceMiddleware.
+# Её middleware должен стоять перед кэшем страниц
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(MIDDLEWARE.index('notes.middleware.AnonymousPageCacheMiddleware'),
+                      'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'choocha.urls'
 
 TEMPLATES = [
@@ -98,6 +107,19 @@ DATABASES = {
         'PASSWORD': 'dc109n6s:)*UU',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Пул соединений psycopg 3 (Django 5.1, пакет psycopg-pool): соединение не открывается заново
+        # на каждый запрос. С пулом CONN_MAX_AGE должен оставаться 0, а CONN_HEALTH_CHECKS включает
+        # проверку соединения при выдаче из пула (ConnectionPool.check_connection)
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,
+                'max_size': 10,
+                'timeout': 10,  # секунд ожидания свободного соединения
+                'max_idle': 60 * 5,
+                'max_lifetime': 60 * 30,
+            },
+        },
     }
 
     #     'default': {
@@ -141,6 +163,27 @@ MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 #MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Имена с хэшем содержимого и сжатые .gz/.br варианты создаются при collectstatic.
+    # При DEBUG = True шаблоны получают обычные имена файлов
+    'staticfiles': {
+        'BACKEND': 'choocha.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Отдача /media/ и /static/ через choocha.files.serve_file.
+# FILES_SENDFILE_BACKEND: None - файл передаёт Django, 'nginx' - X-Accel-Redirect
+# на internal location из FILES_ACCEL_LOCATIONS, 'xsendfile' - заголовок X-Sendfile (Apache)
+FILES_SENDFILE_BACKEND = None
+FILES_ACCEL_LOCATIONS = {
+    'media': '/protected/media/',
+    'static': '/protected/static/',
+}
+FILES_MAX_AGE = 60 * 60 * 24  # Для имён без хэша; имена с хэшем кэшируются на год
+
 
 
 # Default primary key field type
@@ -153,9 +196,10 @@ LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
 LOGIN_URL = 'users:login'
 
+# Бэкенды из users.authentication кэшируют пользователя и его права (см. CachedUserBackendMixin)
 AUTHENTICATION_BACKENDS = (
-    'social_core.backends.github.GithubOAuth2',
-    'django.contrib.auth.backends.ModelBackend',
+    'users.authentication.CachedGithubOAuth2',
+    'users.authentication.CachedModelBackend',
     'users.authentication.EmailAuthBackend',
 )
 
@@ -278,14 +322,54 @@ CKEDITOR_5_CONFIGS = {
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        # RedisCache со счётчиком попаданий и промахов для метрик запросов
+        "BACKEND": "choocha.cache.InstrumentedRedisCache",
         "LOCATION": "redis://127.0.0.1:6379",
     }
 }
 
+# Кэш страниц для анонимных посетителей (notes.middleware.AnonymousPageCacheMiddleware).
+# Записи сбрасываются сигналами моделей, срок хранения только ограничивает объём кэша
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сессии в Redis (choocha.sessions): запись только при изменении данных,
+# продление срока не чаще раза в SESSION_REFRESH_INTERVAL секунд.
+# SESSION_WRITE_THROUGH дублирует сессии в django_session на случай очистки Redis
+SESSION_ENGINE = 'choocha.sessions'
+SESSION_WRITE_THROUGH = False
+SESSION_REFRESH_INTERVAL = 60 * 60
+
 # CACHE_MIDDLEWARE_ALIAS = 'default'
 # CACHE_MIDDLEWARE_SECONDS = 10
 # CACHE_MIDDLEWARE_KEY_PREFIX = 'choocha'
 
+# Пагинация списков статей: 'offset' или 'cursor' (?after=/?before= по (time_create, id)).
+# Способ подсчёта страниц для 'offset': 'exact', 'cached' или 'estimate' (оценка PostgreSQL)
+NOTES_PAGINATION_MODE = 'offset'
+NOTES_PAGINATION_COUNT = 'exact'
+
+# Бюджет запросов к базе на один HTTP-запрос (choocha.middleware.QueryBudgetMiddleware).
+# При превышении - предупреждение в журнал или исключение QueryBudgetExceeded (QUERY_BUDGET_RAISE, для тестов).
+# None отключает соответствующую проверку
+QUERY_BUDGET_QUERIES = 30
+QUERY_BUDGET_DB_TIME = 200  # миллисекунд
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_EXEMPT = ('/admin/', '/__debug__/')
+
+# Метрики запросов (choocha.middleware.PerformanceMiddleware): доля замеряемых запросов, 0 отключает замеры.
+# Метрики процесса в формате Prometheus отдаются по /metrics только с заголовком
+# "Authorization: Bearer <PERF_METRICS_TOKEN>"; без токена адрес отвечает 404.
+# PERF_SERVER_TIMING добавляет замеренным ответам сотрудникам (is_staff) заголовок Server-Timing
+PERF_METRICS_SAMPLE_RATE = 1.0
+PERF_METRICS_TOKEN = None
+PERF_SERVER_TIMING = False
+
+# Асинхронные представления публичных страниц (notes.async_views) и robots.txt.
+# Включать при запуске под ASGI (uvicorn choocha.asgi:application); под WSGI они медленнее синхронных
+ASYNC_PUBLIC_VIEWS = False
+
+# Похожие статьи (notes.related): к сходству по меткам и категории добавлять косинус TF-IDF по тексту
+NOTES_RELATED_TFIDF = False
+
 SITE_ID = 1
 YANDEX_METRICA_COUNTER_ID = 'choocha.ru'
\ No newline at end of file
@@ -0,0 +1,41 @@
+# choocha\storage.py
+import gzip
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен: без него создаются только .gz
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.xml', '.json', '.map', '.html')
+MIN_SIZE = 512  # Маленькие файлы после сжатия почти не уменьшаются
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хэширует имена статики для вечного кэширования и рядом с текстовыми файлами
+    кладёт заранее сжатые .gz и .br, которые отдаёт choocha.files.serve_file.
+    """
+    # Часть файлов лежит прямо в STATIC_ROOT и не попадает в манифест
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in list(self.hashed_files.values()) + list(paths):
+            self._compress(Path(self.path(name)))
+
+    @staticmethod
+    def _compress(path: Path) -> None:
+        if path.suffix not in COMPRESSIBLE or not path.is_file() or path.stat().st_size < MIN_SIZE:
+            return
+        data = path.read_bytes()
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for extension, compressed in variants:
+            if len(compressed) < len(data):
+                path.with_name(path.name + extension).write_bytes(compressed)
@@ -16,23 +16,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.decorators.cache import never_cache
-from django.views.static import serve
-from django.contrib.sitemaps.views import sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.views.decorators.http import condition
 
-from notes.sitemaps import NoteSitemap, TagSitemap, CategorySitemap
+from notes.conditional import page_etag
+from notes.sitemaps import SITEMAPS
+from .files import serve_file
+from .metrics import metrics_view
 from .settings import BASE_DIR
 from .views import e_handler404, e_handler500
-from .robots import robots_txt
-
-sitemaps = {
-    'notes': NoteSitemap,
-    'tags': TagSitemap,
-    'categories': CategorySitemap,
-}
+from .robots import robots_txt, arobots_txt
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -40,17 +36,24 @@ urlpatterns = [
     path('users/', include('users.urls')),
     path('social-auth/', include('social_django.urls', namespace='social')),
     path("ckeditor5/", include('django_ckeditor_5.urls'), name="ck_editor_5_upload_file"),
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-    re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
-    path("__debug__/", include("debug_toolbar.urls")),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    re_path(r'^media/(?P<path>.*)$', serve_file,
+            {'document_root': settings.MEDIA_ROOT, 'accel_location': settings.FILES_ACCEL_LOCATIONS['media']}),
+    re_path(r'^static/(?P<path>.*)$', serve_file,
+            {'document_root': settings.STATIC_ROOT, 'accel_location': settings.FILES_ACCEL_LOCATIONS['static']}),
+    path('metrics', metrics_view, name='metrics'),
+    # Индекс и страницы разделов кэширует AnonymousPageCacheMiddleware до публикации изменений (группа SITEMAP),
+    # а ETag из поколения этой группы позволяет отвечать роботам 304
+    path('sitemap.xml', condition(etag_func=page_etag)(sitemap_views.index), {'sitemaps': SITEMAPS},
+         name='django.contrib.sitemaps.views.index'),
+    path('sitemap-<section>.xml', condition(etag_func=page_etag)(sitemap_views.sitemap), {'sitemaps': SITEMAPS},
+         name='django.contrib.sitemaps.views.sitemap'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
 
 urlpatterns += [
-    path('robots.txt', robots_txt),
+    path('robots.txt', arobots_txt if settings.ASYNC_PUBLIC_VIEWS else robots_txt),
 ]
 
 handler404 = e_handler404
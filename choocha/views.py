@@ -5,8 +5,8 @@ from django.template import RequestContext
 
 
 def e_handler404(request, exception):
-    return render(request, 'notes/404.html')
+    return render(request, 'notes/404.html', status=404)
 
 
 def e_handler500(request):
-    return render(request, 'notes/500.html')
\ No newline at end of file
+    return render(request, 'notes/500.html', status=500)
\ No newline at end of file
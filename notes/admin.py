@@ -1,9 +1,14 @@
 from django.contrib import admin, messages
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import Q, QuerySet
 from django.http import HttpRequest
 from django.utils.safestring import mark_safe
 
+from .cache import SIDEBAR, SITEMAP, bump_generations
+from .counters import recount_for_notes
 from .models import Note, TagPost, Category
+from .related import schedule as schedule_related
+from .search import search_query
 
 
 @admin.register(Note)
@@ -16,13 +21,33 @@ class NotesAdmin(admin.ModelAdmin):
     )
     list_display_links = ('title', 'cat',)
     ordering = ('time_create', 'title',)
-    search_fields = ('title', 'content_short', 'content_full', 'cat__name',)
+    search_fields = ('title', 'content_short', 'content_full', 'cat__name',)  # См. get_search_results
     list_editable = ('is_published',)
     list_per_page = 5
     actions = ['set_published', 'set_draft', ]
     list_filter = ['cat__name', 'is_published', ]
     save_on_top = True
 
+    def get_queryset(self, request: HttpRequest) -> QuerySet:
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name == 'notes_note_changelist':
+            # В списке статей нужны только отображаемые колонки, тексты CKEditor не загружаем
+            queryset = queryset.defer('content_short', 'content_full', 'excerpt_html', 'excerpt_text',
+                                      'meta_description', 'search_vector')
+        return queryset
+
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet, search_term: str) -> tuple[QuerySet, bool]:
+        # Тексты ищем по GIN-индексу search_vector, как и на сайте, а не ILIKE по полным текстам.
+        # Заголовок и название категории короткие и по-прежнему находятся по подстроке
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            Q(search_vector=search_query(search_term))
+            | Q(title__icontains=search_term)
+            | Q(cat__name__icontains=search_term)
+        ), False
+
     @staticmethod
     @admin.display(description='Изображение')
     def post_image(note: Note) -> str:
@@ -33,26 +58,46 @@ class NotesAdmin(admin.ModelAdmin):
     @staticmethod
     @admin.display(description='Размер изображения')
     def post_image_size(note: Note) -> str:
+        if note.image_width:
+            return f'{note.image_width}x{note.image_height}'
         if note.image:
-            return f'{note.image.width}x{note.image.height}'
+            return 'Размер неизвестен'
         return 'Нет фото'
 
+    @staticmethod
+    def _set_status(queryset: QuerySet, status: Note.Status) -> int:
+        # update() не отправляет сигналы, поэтому счётчики и кэш обновляем вручную.
+        # Поколение боковой панели входит в зависимости всех HTML-страниц
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True))
+            count = Note.objects.filter(pk__in=pks).update(is_published=status)
+            recount_for_notes(pks)
+            # Без каскада: при сотнях выбранных статей каскад пересчитал бы в запросе до CASCADE_LIMIT
+            # чужих списков на каждую. Остальные списки обновит rebuild_related
+            schedule_related(pks, cascade=False)
+            transaction.on_commit(lambda: bump_generations([SIDEBAR, SITEMAP]))
+        return count
+
     @admin.action(description='Опубликовать выбранные записи')
     def set_published(self, request: HttpRequest, queryset: QuerySet) -> None:
-        count = queryset.update(is_published=Note.Status.PUBLISHED)
+        count = self._set_status(queryset, Note.Status.PUBLISHED)
         self.message_user(request, f'{count} записей опубликованы')
 
     @admin.action(description='Снять с публикации выбранные записи')
     def set_draft(self, request: HttpRequest, queryset: QuerySet) -> None:
-        count = queryset.update(is_published=Note.Status.DRAFT)
+        count = self._set_status(queryset, Note.Status.DRAFT)
         self.message_user(request, f'{count} записей сняты с публикации', messages.WARNING)
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'slug')
+    list_display = ('id', 'name', 'slug', 'published_count')
     list_display_links = ('id', 'name',)
     search_fields = ('name',)
 
 
-admin.site.register(TagPost)
+@admin.register(TagPost)
+class TagPostAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tag', 'slug', 'published_count')
+    list_display_links = ('id', 'tag',)
+    search_fields = ('tag',)
@@ -0,0 +1,115 @@
+# choocha\notes\async_views.py
+"""
+Асинхронные версии публичных страниц для запуска под ASGI (settings.ASYNC_PUBLIC_VIEWS).
+Данные выбираются асинхронным ORM, а шаблон отрисовывает обработчик Django:
+TemplateResponse из асинхронного представления рендерится в потоке, потому что
+теги боковой панели и меню обращаются к базе синхронно.
+"""
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db.models import QuerySet
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.views.generic import View
+from django.views.generic.base import ContextMixin, TemplateResponseMixin
+from django.views.generic.list import MultipleObjectMixin
+
+from .conditional import (async_conditional_page, ahome_last_modified, apost_last_modified, acategory_last_modified,
+                          atag_last_modified)
+from .models import RelatedNote
+from .slugs import aget_category_or_404, aget_tag_or_404
+from .text import build_description, strip_tags_fast
+from .utils import DataMixin, NotesPaginationMixin
+from .views import published_list, published_post
+
+
+class AsyncNotesListView(NotesPaginationMixin, DataMixin, MultipleObjectMixin, TemplateResponseMixin, View):
+    template_name = 'notes/index.html'
+    context_object_name = 'posts'
+    paginate_by = 5
+
+    def get_queryset(self) -> QuerySet:
+        return published_list()
+
+    async def aget_page_context(self) -> dict[str, Any]:
+        """Данные страницы для get_mixin_context; подклассы дополняют их и выбирают категорию или метку из URL."""
+        return {}
+
+    async def apaginate_queryset(self, queryset: QuerySet, page_size: int) -> tuple:
+        if self.get_pagination_mode() == 'cursor' or self.get_count_mode() != 'exact':
+            # CursorPaginator и ApproximateCountPaginator синхронные: страница выбирается в потоке одним вызовом
+            return await sync_to_async(self.paginate_queryset)(queryset, page_size)
+        paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                       allow_empty_first_page=self.get_allow_empty())
+        paginator.count = await queryset.acount()
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page = paginator.page(paginator.num_pages if page_number == 'last' else int(page_number))
+        except (ValueError, InvalidPage) as e:
+            raise Http404(f'Неверная страница: {e}')
+        # Количество уже известно, page() вернул ленивый срез - выбираем его асинхронно
+        page.object_list = [note async for note in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs) -> dict[str, Any]:
+        # Страница выбрана в get(): синхронная пагинация MultipleObjectMixin здесь не нужна
+        return ContextMixin.get_context_data(self, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        page_context = await self.aget_page_context()
+        paginator, page, posts, is_paginated = await self.apaginate_queryset(self.get_queryset(), self.paginate_by)
+        context = self.get_context_data(paginator=paginator, page_obj=page, is_paginated=is_paginated,
+                                        object_list=posts, **{self.context_object_name: posts})
+        return self.render_to_response(self.get_mixin_context(context, **page_context))
+
+
+class AsyncNoteHome(AsyncNotesListView):
+    async def aget_page_context(self) -> dict[str, Any]:
+        return {'page_description': 'Домашняя страница', 'page_description_name': 'description',
+                'title': 'Главная страница', 'cat_selected': 0}
+
+
+class AsyncNotesCategory(AsyncNotesListView):
+    def get_queryset(self) -> QuerySet:
+        return published_list().filter(cat_id=self.category.pk)
+
+    async def aget_page_context(self) -> dict[str, Any]:
+        self.category = category = await aget_category_or_404(self.kwargs['cat_slug'])
+        return {'page_description': f'Все статьи из категории {category.name}', 'page_description_name': 'description',
+                'cat_selected': category.pk, 'title': 'Категория: ' + category.name}
+
+
+class AsyncNotesTags(AsyncNotesListView):
+    def get_queryset(self) -> QuerySet:
+        return published_list().filter(tags=self.tag.pk)
+
+    async def aget_page_context(self) -> dict[str, Any]:
+        self.tag = tag = await aget_tag_or_404(self.kwargs['tag_slug'])
+        return {'page_description': f'Все статьи с тэгом {tag.name}', 'page_description_name': 'description',
+                'title': 'Тег: ' + tag.name}
+
+
+class AsyncShowPost(DataMixin, TemplateResponseMixin, ContextMixin, View):
+    template_name = 'notes/show_post.html'
+
+    async def get(self, request, *args, **kwargs):
+        post = await aget_object_or_404(published_post(), slug=kwargs['post_slug'])
+        related = (RelatedNote.objects.filter(note=post, related__is_published=True)
+                   .select_related('related').only('related__title', 'related__slug'))
+        context = self.get_context_data(
+            object=post,
+            post=post,
+            page_description=post.description or build_description(post.meta_description,
+                                                                   strip_tags_fast(post.content_short)),
+            page_description_name='description',
+            related_links=[link async for link in related],
+        )
+        return self.render_to_response(self.get_mixin_context(context, title=post.title))
+
+
+note_home = async_conditional_page(ahome_last_modified)(AsyncNoteHome.as_view())
+show_post = async_conditional_page(apost_last_modified)(AsyncShowPost.as_view())
+notes_category = async_conditional_page(acategory_last_modified)(AsyncNotesCategory.as_view())
+notes_tags = async_conditional_page(atag_last_modified)(AsyncNotesTags.as_view())
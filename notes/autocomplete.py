@@ -0,0 +1,71 @@
+# choocha\notes\autocomplete.py
+import hashlib
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Upper
+
+from .cache import SIDEBAR, NOTES, FRAGMENT_TIMEOUT, get_generation
+from .models import Note, TagPost, Category
+
+MIN_LENGTH = 2
+MAX_LENGTH = 50
+LIMIT = 10
+
+
+def _notes() -> QuerySet:
+    return Note.published.only('title', 'slug')
+
+
+def _tags() -> QuerySet:
+    return TagPost.objects.only('tag', 'slug')
+
+
+def _categories() -> QuerySet:
+    return Category.objects.only('name', 'slug')
+
+
+# Источник подсказок: набор записей, поле для поиска, группа кэша, сбрасываемая при их изменении,
+# и представление записи в ответе. Метки и категории сбрасывают боковую панель, опубликованные статьи - NOTES
+SOURCES = {
+    'notes': (_notes, 'title', NOTES, lambda note: {'text': note.title, 'url': note.get_absolute_url()}),
+    'tags': (_tags, 'tag', SIDEBAR,
+             lambda tag: {'id': tag.pk, 'text': tag.tag, 'url': tag.get_absolute_url()}),
+    'categories': (_categories, 'name', SIDEBAR,
+                   lambda category: {'id': category.pk, 'text': category.name, 'url': category.get_absolute_url()}),
+}
+
+
+def normalize(term: str) -> str:
+    return ' '.join(term.split())[:MAX_LENGTH].upper()
+
+
+def find(source: str, term: str, limit: int = LIMIT) -> list[dict]:
+    """
+    Подсказки для строки term: сначала названия, начинающиеся с неё, затем содержащие её,
+    затем похожие с учётом опечаток. Все условия идут по триграммному индексу UPPER(поля).
+    Результат кэшируется по нормализованной строке до смены поколения группы источника.
+    """
+    queryset, field, group, serialize = SOURCES[source]
+    term = normalize(term)
+    if len(term) < MIN_LENGTH:
+        return []
+
+    digest = hashlib.md5(term.encode()).hexdigest()
+    key = f'notes:autocomplete:{source}:{get_generation(group)}:{limit}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        matches = (
+            queryset()
+            .alias(upper=Upper(field))
+            .filter(Q(upper__contains=term) | TrigramWordSimilar(F('upper'), term))
+            .alias(prefix=Case(When(upper__startswith=term, then=Value(1)), default=Value(0),
+                               output_field=IntegerField()),
+                   similarity=TrigramWordSimilarity(term, 'upper'))
+            .order_by('-prefix', '-similarity', field)[:limit]
+        )
+        results = [serialize(obj) for obj in matches]
+        cache.set(key, results, FRAGMENT_TIMEOUT)
+    return results
@@ -0,0 +1,192 @@
+# choocha\notes\bench.py
+"""
+Замеры публичных страниц для команд bench и loadtest: задержка, запросы к базе и память
+на запрос через тестовый клиент Django, а также нагрузка на запущенный WSGI/ASGI-сервер.
+"""
+import http.client
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.db.models import Count
+from django.template import Context, Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from .cache import SIDEBAR, bump_generations
+from .middleware import CACHED_VIEWS
+from .models import Note, TagPost, Category
+
+
+class LoadResult(NamedTuple):
+    path: str
+    duration: float  # секунды
+    status: int  # 0 - ошибка соединения
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def summarize(durations: list[float]) -> dict[str, float]:
+    """Сводка по длительностям в секундах, в миллисекундах."""
+    values = [duration * 1000 for duration in durations]
+    return {
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'mean_ms': round(statistics.fmean(values), 3) if values else 0.0,
+    }
+
+
+def default_targets() -> dict[str, str]:
+    """Адреса замеров: самые наполненные категория и метка, свежая статья, карта сайта."""
+    targets = {'home': reverse('home')}
+    note = Note.published.values_list('slug', flat=True).first()
+    category = Category.objects.order_by('-published_count').values_list('slug', flat=True).first()
+    tag = TagPost.objects.order_by('-published_count').values_list('slug', flat=True).first()
+    if note:
+        targets['post'] = reverse('post', kwargs={'post_slug': note})
+    if category:
+        targets['category'] = reverse('category', kwargs={'cat_slug': category})
+    if tag:
+        targets['tag'] = reverse('tag', kwargs={'tag_slug': tag})
+    targets['sitemap'] = reverse('django.contrib.sitemaps.views.index')
+    return targets
+
+
+def data_size() -> dict[str, int]:
+    return {
+        'notes': Note.objects.count(),
+        'published': Note.published.count(),
+        'categories': Category.objects.count(),
+        'tags': TagPost.objects.count(),
+        'note_tags': Note.tags.through.objects.aggregate(total=Count('pk'))['total'],
+    }
+
+
+def page_invalidator(path: str) -> Callable[[], None]:
+    """Сбрасывает кэш страницы и её фрагментов, увеличивая поколения её групп (как сигналы моделей)."""
+    match = resolve(path)
+    groups = CACHED_VIEWS[match.url_name](match.kwargs)
+    return lambda: bump_generations(groups)
+
+
+def measure(run: Callable[[], object], iterations: int, before: Callable[[], None] | None = None,
+            allocation_runs: int = 3) -> dict[str, float]:
+    """
+    Задержка, число запросов к базе (максимум по итерациям) и пик памяти на один вызов run.
+    Память меряется отдельными прогонами под tracemalloc: он сильно замедляет код.
+    """
+    durations, queries = [], []
+    for _ in range(iterations):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            run()
+            durations.append(time.perf_counter() - started)
+        queries.append(len(captured))
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(allocation_runs):
+            if before:
+                before()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            run()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        **summarize(durations),
+        'queries': max(queries, default=0),
+        'alloc_peak_kib': round(statistics.median(peaks) / 1024, 1) if peaks else 0.0,
+    }
+
+
+def measure_page(client: Client, path: str, iterations: int, cold: bool) -> dict[str, float]:
+    """cold - страница собирается заново (кэш страниц и фрагментов сброшен), иначе берётся из кэша."""
+
+    def run():
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: ответ {response.status_code}')
+
+    run()  # прогрев: импорты, карты слагов, а для warm - кэш страницы
+    return measure(run, iterations, before=page_invalidator(path) if cold else None)
+
+
+def measure_sidebar(iterations: int, cold: bool) -> dict[str, float]:
+    """Теги боковой панели, которые выводятся на каждой HTML-странице."""
+    template = Template('{% load show_categories_and_tags %}{% show_categories %}{% show_all_tags %}')
+
+    def run():
+        template.render(Context())
+
+    run()
+    return measure(run, iterations, before=(lambda: bump_generations([SIDEBAR])) if cold else None)
+
+
+def run_load(base_url: str, paths: list[str], requests: int, concurrency: int, warmup: int = 0,
+             headers: dict[str, str] | None = None) -> tuple[list[LoadResult], float]:
+    """
+    Параллельные GET-запросы к запущенному серверу по постоянным соединениям (по одному на поток).
+    Возвращает результаты замеренных запросов и общее время замера в секундах.
+    """
+    url = urlsplit(base_url)
+    if url.scheme not in ('http', 'https') or not url.hostname:
+        raise ValueError(f'Неверный адрес сервера: {base_url}')
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    local = threading.local()
+
+    def fetch(number: int) -> LoadResult:
+        path = paths[number % len(paths)]
+        if not hasattr(local, 'connection'):
+            local.connection = connection_class(url.hostname, url.port, timeout=30)
+        started = time.perf_counter()
+        try:
+            local.connection.request('GET', path, headers=headers or {})
+            response = local.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # Соединение закрыто сервером: следующий запрос потока откроет новое
+            local.connection.close()
+            del local.connection
+            status = 0
+        return LoadResult(path, time.perf_counter() - started, status)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(warmup)))
+        started = time.perf_counter()
+        results = list(executor.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize_load(results: list[LoadResult], elapsed: float) -> dict[str, dict]:
+    """Сводка нагрузочного прогона по адресам и итог ('total')."""
+    by_path: dict[str, list[LoadResult]] = {}
+    for result in results:
+        by_path.setdefault(result.path, []).append(result)
+    summary = {}
+    for path, items in [*by_path.items(), ('total', results)]:
+        summary[path] = {
+            'requests': len(items),
+            'errors': sum(1 for item in items if not 200 <= item.status < 400),
+            'rps': round(len(items) / elapsed, 1) if elapsed else 0.0,
+            **summarize([item.duration for item in items]),
+        }
+    return summary
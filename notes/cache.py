@@ -0,0 +1,90 @@
+# choocha\notes\cache.py
+import time
+from typing import Callable, Iterable
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils.safestring import SafeString, mark_safe
+
+# Имена групп (тегов) кэша. Закэшированная запись запоминает поколения групп,
+# от которых зависит, и считается устаревшей, как только любое из них увеличится
+SIDEBAR = 'sidebar'  # боковая панель; от неё зависят все HTML-страницы
+NOTES = 'notes'  # общий список опубликованных статей
+SITEMAP = 'sitemap'
+FRAGMENT_TIMEOUT = 60 * 60 * 24  # Старые поколения просто дожидаются истечения срока
+
+
+def note_tag(slug: str) -> str:
+    return f'note:{slug}'
+
+
+def category_tag(slug: str) -> str:
+    return f'cat:{slug}'
+
+
+def tagpost_tag(slug: str) -> str:
+    return f'tag:{slug}'
+
+
+def generation_key(name: str) -> str:
+    return f'notes:generation:{name}'
+
+
+def get_generation(name: str) -> int:
+    """Текущее поколение именованной группы кэшированных записей."""
+    return get_generations([name])[name]
+
+
+def get_generations(names: Iterable[str], found: dict | None = None) -> dict[str, int]:
+    """
+    Текущие поколения нескольких групп за одно обращение к кэшу.
+    found - уже прочитанные из кэша значения, если ключи поколений запрашивались вместе с другими.
+    """
+    keys = {generation_key(name): name for name in names}
+    if found is None:
+        found = cache.get_many(keys)
+    generations = {}
+    for key, name in keys.items():
+        generation = found.get(key)
+        if generation is None:
+            # Начальное значение берём из времени, чтобы после вытеснения ключа
+            # не совпасть с поколением, записи которого ещё лежат в кэше
+            generation = time.time_ns()
+            if not cache.add(key, generation, timeout=None):
+                generation = cache.get(key, generation)
+        generations[name] = generation
+    return generations
+
+
+async def aget_generations(names: Iterable[str]) -> dict[str, int]:
+    """get_generations для асинхронных представлений."""
+    keys = {generation_key(name): name for name in names}
+    found = await cache.aget_many(keys)
+    if len(found) == len(keys):
+        return {name: found[key] for key, name in keys.items()}
+    # Недостающее поколение создаётся один раз после вытеснения ключа
+    return await sync_to_async(get_generations)(keys.values(), found)
+
+
+def bump_generation(name: str) -> None:
+    """Делает устаревшими все записи группы, увеличивая счётчик поколения."""
+    key = generation_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_generations(names: Iterable[str]) -> None:
+    for name in set(names):
+        bump_generation(name)
+
+
+def get_fragment(name: str, suffix: str, render: Callable[[], str]) -> SafeString:
+    """Возвращает отрендеренный фрагмент из кэша, при промахе рендерит и сохраняет его."""
+    key = f'notes:fragment:{name}:{get_generation(name)}:{suffix}'
+    html = cache.get(key)
+    if html is None:
+        html = str(render())
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+    return mark_safe(html)
@@ -0,0 +1,170 @@
+# choocha\notes\conditional.py
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Max, QuerySet
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from . import slugs
+from .cache import NOTES, category_tag, tagpost_tag, get_generation, get_generations, aget_generations
+from .middleware import CACHED_VIEWS
+from .models import Note
+
+LAST_MODIFIED_TIMEOUT = 60 * 60 * 24
+NO_NOTES = 0  # Отметка в кэше для пустого списка: None означает промах
+
+
+def page_generations(request, kwargs: dict) -> dict[str, int]:
+    """Поколения групп кэша страницы; AnonymousPageCacheMiddleware уже мог прочитать их в этом запросе."""
+    if not hasattr(request, '_page_generations'):
+        request._page_generations = get_generations(CACHED_VIEWS[request.resolver_match.url_name](kwargs))
+    return request._page_generations
+
+
+async def apage_generations(request, kwargs: dict) -> dict[str, int]:
+    if not hasattr(request, '_page_generations'):
+        request._page_generations = await aget_generations(CACHED_VIEWS[request.resolver_match.url_name](kwargs))
+    return request._page_generations
+
+
+def generations_etag(user_pk: int | None, generations: dict[str, int]) -> str:
+    raw = '|'.join([str(user_pk or 0), *(f'{name}={generations[name]}' for name in sorted(generations))])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_etag(request, *args, **kwargs) -> str:
+    """
+    ETag из поколений групп кэша, от которых зависит страница, и текущего пользователя.
+    Не требует запросов к базе: любое изменение, сбрасывающее кэш страницы, меняет и ETag.
+    """
+    return generations_etag(request.user.pk, page_generations(request, kwargs))
+
+
+def cached_last_modified(tag: str, queryset: QuerySet) -> datetime | None:
+    """Максимальный time_update статей списка, закэшированный до смены поколения группы tag."""
+    key = f'notes:lastmod:{tag}:{get_generation(tag)}'
+    last_modified = cache.get(key)
+    if last_modified is None:
+        last_modified = queryset.aggregate(last=Max('time_update'))['last'] or NO_NOTES
+        cache.set(key, last_modified, LAST_MODIFIED_TIMEOUT)
+    return last_modified or None
+
+
+async def acached_last_modified(tag: str, queryset: QuerySet) -> datetime | None:
+    generations = await aget_generations([tag])
+    key = f'notes:lastmod:{tag}:{generations[tag]}'
+    last_modified = await cache.aget(key)
+    if last_modified is None:
+        last_modified = (await queryset.aaggregate(last=Max('time_update')))['last'] or NO_NOTES
+        await cache.aset(key, last_modified, LAST_MODIFIED_TIMEOUT)
+    return last_modified or None
+
+
+def post_last_modified(request, post_slug: str) -> datetime | None:
+    return Note.published.filter(slug=post_slug).values_list('time_update', flat=True).first()
+
+
+def home_last_modified(request) -> datetime | None:
+    return cached_last_modified(NOTES, Note.published.all())
+
+
+def category_last_modified(request, cat_slug: str) -> datetime | None:
+    category = slugs.categories.get(cat_slug)
+    if category is None:
+        return None
+    return cached_last_modified(category_tag(cat_slug), Note.published.filter(cat_id=category.pk))
+
+
+def tag_last_modified(request, tag_slug: str) -> datetime | None:
+    tag = slugs.tags.get(tag_slug)
+    if tag is None:
+        return None
+    return cached_last_modified(tagpost_tag(tag_slug), Note.published.filter(tags=tag.pk))
+
+
+async def apost_last_modified(request, post_slug: str) -> datetime | None:
+    return await Note.published.filter(slug=post_slug).values_list('time_update', flat=True).afirst()
+
+
+async def ahome_last_modified(request) -> datetime | None:
+    return await acached_last_modified(NOTES, Note.published.all())
+
+
+async def acategory_last_modified(request, cat_slug: str) -> datetime | None:
+    category = await slugs.categories.aget(cat_slug)
+    if category is None:
+        return None
+    return await acached_last_modified(category_tag(cat_slug), Note.published.filter(cat_id=category.pk))
+
+
+async def atag_last_modified(request, tag_slug: str) -> datetime | None:
+    tag = await slugs.tags.aget(tag_slug)
+    if tag is None:
+        return None
+    return await acached_last_modified(tagpost_tag(tag_slug), Note.published.filter(tags=tag.pk))
+
+
+def _patch_page_cache_control(response, authenticated: bool) -> None:
+    # Без no-cache браузер эвристически считал бы страницу свежей и не переспрашивал сервер
+    if authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+def conditional_page(last_modified_func):
+    """
+    Отвечает 304 на If-None-Match/If-Modified-Since до вызова представления.
+    Last-Modified отдаётся только анонимам: он не учитывает меню пользователя, а ETag учитывает.
+    """
+
+    def anonymous_last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return last_modified_func(request, *args, **kwargs)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=page_etag, last_modified_func=anonymous_last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            _patch_page_cache_control(response, request.user.is_authenticated)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def async_conditional_page(last_modified_func):
+    """
+    conditional_page для асинхронных представлений: last_modified_func - корутина,
+    пользователь берётся через request.auser(), поколения - асинхронными вызовами кэша.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            last_modified = None if user.is_authenticated else await last_modified_func(request, *args, **kwargs)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            etag = quote_etag(generations_etag(user.pk, await apage_generations(request, kwargs)))
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if timestamp and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(timestamp)
+                response.headers.setdefault('ETag', etag)
+            _patch_page_cache_control(response, user.is_authenticated)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,43 @@
+# choocha\notes\counters.py
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Note, TagPost, Category
+
+
+def _count_subquery(queryset: QuerySet, group_by: str) -> Coalesce:
+    counts = queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _recount(queryset: QuerySet, published: QuerySet, group_by: str) -> int:
+    # Сначала блокируем строки счётчиков (по порядку pk, чтобы не было взаимоблокировок), затем считаем
+    # отдельным запросом. В READ COMMITTED UPDATE с подзапросом считает по снимку начала запроса:
+    # дождавшись блокировки параллельной транзакции, он записал бы число без её статьи
+    with transaction.atomic():
+        locked = list(queryset.order_by('pk').select_for_update().values_list('pk', flat=True))
+        return queryset.model.objects.filter(pk__in=locked).update(
+            published_count=_count_subquery(published, group_by))
+
+
+def recount_categories(pks: Iterable[int] | QuerySet | None = None) -> int:
+    """Пересчитывает published_count у категорий (у всех, если pks не переданы)."""
+    queryset = Category.objects.all() if pks is None else Category.objects.filter(pk__in=pks)
+    return _recount(queryset, Note.published.filter(cat=OuterRef('pk')), 'cat')
+
+
+def recount_tags(pks: Iterable[int] | QuerySet | None = None) -> int:
+    """Пересчитывает published_count у меток (у всех, если pks не переданы)."""
+    queryset = TagPost.objects.all() if pks is None else TagPost.objects.filter(pk__in=pks)
+    published = Note.tags.through.objects.filter(tagpost=OuterRef('pk'), note__is_published=True)
+    return _recount(queryset, published, 'tagpost')
+
+
+def recount_for_notes(note_pks: Iterable[int]) -> None:
+    """Пересчитывает счётчики категорий и меток, к которым относятся указанные статьи."""
+    note_pks = list(note_pks)
+    recount_categories(Category.objects.filter(posts__pk__in=note_pks).values('pk'))
+    recount_tags(Note.tags.through.objects.filter(note__in=note_pks).values('tagpost'))
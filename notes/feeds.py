@@ -0,0 +1,156 @@
+# choocha\notes\feeds.py
+import hashlib
+from typing import Callable
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .cache import SIDEBAR, NOTES, FRAGMENT_TIMEOUT, category_tag, tagpost_tag, get_generations
+from .conditional import home_last_modified, category_last_modified, tag_last_modified
+from .models import Note, TagPost, Category
+
+FEED_LIMIT = 20
+FEED_MAX_AGE = 60 * 5
+# Колонки, которые выводит лента: вместо content_full - готовый анонс excerpt_html
+FEED_FIELDS = ('title', 'slug', 'excerpt_html', 'time_create', 'time_update', 'cat__name', 'author__username')
+
+
+class NotesFeed(Feed):
+    """Последние опубликованные статьи сайта."""
+
+    def title(self, obj=None) -> str:
+        return 'choocha.ru: новые статьи'
+
+    def description(self, obj=None) -> str:
+        return 'Новые статьи сайта choocha.ru'
+
+    def subtitle(self, obj=None) -> str:
+        return self.description(obj)
+
+    def link(self, obj=None) -> str:
+        return reverse('home')
+
+    def get_queryset(self, obj=None) -> QuerySet:
+        return Note.published.select_related('cat', 'author').only(*FEED_FIELDS)
+
+    def items(self, obj=None) -> QuerySet:
+        return self.get_queryset(obj).order_by('-time_create', '-id')[:FEED_LIMIT]
+
+    def item_title(self, item: Note) -> str:
+        return item.title
+
+    def item_description(self, item: Note) -> str:
+        return item.excerpt_html
+
+    def item_pubdate(self, item: Note):
+        return item.time_create
+
+    def item_updateddate(self, item: Note):
+        return item.time_update
+
+    def item_author_name(self, item: Note) -> str | None:
+        return item.author.username if item.author else None
+
+    def item_categories(self, item: Note) -> tuple[str]:
+        return (item.cat.name,)
+
+
+class CategoryFeed(NotesFeed):
+    def get_object(self, request, cat_slug: str) -> Category:
+        return get_object_or_404(Category.objects.only('name', 'slug'), slug=cat_slug)
+
+    def title(self, obj: Category) -> str:
+        return f'choocha.ru: {obj.name}'
+
+    def description(self, obj: Category) -> str:
+        return f'Новые статьи из категории {obj.name}'
+
+    def link(self, obj: Category) -> str:
+        return obj.get_absolute_url()
+
+    def get_queryset(self, obj: Category) -> QuerySet:
+        return super().get_queryset().filter(cat=obj)
+
+
+class TagFeed(NotesFeed):
+    def get_object(self, request, tag_slug: str) -> TagPost:
+        return get_object_or_404(TagPost.objects.only('tag', 'slug'), slug=tag_slug)
+
+    def title(self, obj: TagPost) -> str:
+        return f'choocha.ru: {obj.tag}'
+
+    def description(self, obj: TagPost) -> str:
+        return f'Новые статьи с тэгом {obj.tag}'
+
+    def link(self, obj: TagPost) -> str:
+        return obj.get_absolute_url()
+
+    def get_queryset(self, obj: TagPost) -> QuerySet:
+        return super().get_queryset().filter(tags=obj)
+
+
+class AtomNotesFeed(NotesFeed):
+    feed_type = Atom1Feed
+
+
+class AtomCategoryFeed(CategoryFeed):
+    feed_type = Atom1Feed
+
+
+class AtomTagFeed(TagFeed):
+    feed_type = Atom1Feed
+
+
+def cached_feed(feed: Feed, groups: Callable[[dict], tuple], last_modified_func: Callable):
+    """
+    Ленты опрашиваются агрегаторами постоянно. Last-Modified - самое свежее time_update статей ленты,
+    ETag - оно же вместе с поколениями групп кэша (снятие статьи с публикации time_update не меняет).
+    Оба значения берутся из кэша, поэтому 304 и повторная выдача готового тела не обращаются к базе.
+    """
+
+    @require_safe
+    def view(request, **kwargs):
+        last_modified = last_modified_func(request, **kwargs)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        generations = get_generations(groups(kwargs))
+        # Абсолютные ссылки ленты зависят от схемы запроса: http- и https-версии кэшируются отдельно
+        raw = '|'.join([request.scheme, request.get_host(), request.path, str(timestamp),
+                        *(f'{name}={generations[name]}' for name in sorted(generations))])
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        etag = f'"{digest}"'
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            key = f'notes:feed:{digest}'
+            entry = cache.get(key)
+            if entry is None:
+                rendered = feed(request, **kwargs)
+                entry = {'content': rendered.content, 'content_type': rendered['Content-Type']}
+                cache.set(key, entry, FRAGMENT_TIMEOUT)
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, public=True, max_age=FEED_MAX_AGE)
+        return response
+
+    return view
+
+
+# Категории выводятся в элементах лент, их переименование сбрасывает боковую панель
+latest_rss = cached_feed(NotesFeed(), lambda kwargs: (SIDEBAR, NOTES), home_last_modified)
+latest_atom = cached_feed(AtomNotesFeed(), lambda kwargs: (SIDEBAR, NOTES), home_last_modified)
+category_rss = cached_feed(CategoryFeed(), lambda kwargs: (SIDEBAR, category_tag(kwargs['cat_slug'])),
+                           category_last_modified)
+category_atom = cached_feed(AtomCategoryFeed(), lambda kwargs: (SIDEBAR, category_tag(kwargs['cat_slug'])),
+                            category_last_modified)
+tag_rss = cached_feed(TagFeed(), lambda kwargs: (SIDEBAR, tagpost_tag(kwargs['tag_slug'])), tag_last_modified)
+tag_atom = cached_feed(AtomTagFeed(), lambda kwargs: (SIDEBAR, tagpost_tag(kwargs['tag_slug'])), tag_last_modified)
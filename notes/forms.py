@@ -1,5 +1,6 @@
 from django import forms
 # from django.core.validators import MinLengthValidator, MaxLengthValidator
+from django.urls import reverse_lazy
 from django.utils.deconstruct import deconstructible
 from django_ckeditor_5.widgets import CKEditor5Widget
 
@@ -20,6 +21,30 @@ class LettersAnDigitsValidator:
             raise forms.ValidationError(self.message, code=self.code)
 
 
+class TagAutocompleteWidget(forms.SelectMultiple):
+    """
+    Выбор меток без вывода всей таблицы TagPost: в <select> попадают только выбранные метки,
+    новые добавляются через поле с подсказками из notes.views.autocomplete_view.
+    """
+    template_name = 'notes/widgets/tag_autocomplete.html'
+    autocomplete_url = reverse_lazy('autocomplete')
+
+    class Media:
+        js = ('notes/js/autocomplete.js',)
+
+    def optgroups(self, name, value, attrs=None):
+        # После ошибки валидации value содержит присланные строки, в том числе неверные
+        selected = [pk for pk in value if str(pk).isdigit()]
+        tags = self.choices.queryset.filter(pk__in=selected) if selected else []
+        return [(None, [self.create_option(name, tag.pk, str(tag), True, index, attrs=attrs)], index)
+                for index, tag in enumerate(tags)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['autocomplete_url'] = f'{self.autocomplete_url}?source=tags'
+        return context
+
+
 class AddPostForm(forms.ModelForm):
     cat = forms.ModelChoiceField(queryset=Category.objects.all(), label="Категория", empty_label="Категория не выбрана")
 
@@ -28,6 +53,7 @@ class AddPostForm(forms.ModelForm):
         fields = ['title', 'content_short', 'content_full', 'image', 'is_published', 'cat', 'tags', 'meta_description']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-input'}),
+            'tags': TagAutocompleteWidget,
         }
         # validators = {
         #    'title': LettersAnDigitsValidator(),
@@ -65,6 +91,7 @@ class UpdatePostForm(forms.ModelForm):
         fields = ['title', 'content_short', 'content_full', 'image', 'is_published', 'cat', 'tags', 'meta_description']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-input'}),
+            'tags': TagAutocompleteWidget,
         }
 
 
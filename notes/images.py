@@ -0,0 +1,108 @@
+# choocha\notes\images.py
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps
+
+# Ширины уменьшенных копий в пикселях. Копии больше оригинала не создаются
+DERIVATIVES = {
+    'thumb': 200,
+    'list': 600,
+    'full': 1200,
+}
+# Расширение, формат Pillow, MIME-тип и параметры сохранения
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+DERIVATIVES_DIR = 'derivatives'
+
+logger = logging.getLogger(__name__)
+
+
+def image_dimensions(image: FieldFile) -> tuple[int | None, int | None]:
+    """Ширина и высота изображения; (None, None), если файла нет или его не удалось прочитать."""
+    if not image:
+        return None, None
+    try:
+        return get_image_dimensions(image)
+    except (OSError, ValueError):
+        return None, None
+
+
+def dimensions_outdated(image: FieldFile, width: int | None) -> bool:
+    """Нужно ли перечитать размеры: загружен новый файл, файл убран или размеры ещё не известны."""
+    if image and not image._committed:
+        return True
+    return bool(image) == (width is None)
+
+
+def srcset_widths(width: int | None) -> dict[str, int]:
+    """Фактические ширины копий: копии шире оригинала не создаются, они совпадают с ним по размеру."""
+    if not width:
+        return DERIVATIVES
+    return {size: min(derivative_width, width) for size, derivative_width in DERIVATIVES.items()}
+
+
+def derivative_name(name: str, size: str, extension: str) -> str:
+    """Имя копии в хранилище: images/2025/01/21/a.png -> derivatives/images/2025/01/21/a/list.webp"""
+    stem, _ = posixpath.splitext(name)
+    return f'{DERIVATIVES_DIR}/{stem}/{size}.{extension}'
+
+
+def derivative_url(image: FieldFile, size: str, extension: str) -> str:
+    return image.storage.url(derivative_name(image.name, size, extension))
+
+
+def has_derivatives(image: FieldFile) -> bool:
+    return bool(image) and image.storage.exists(derivative_name(image.name, 'thumb', FORMATS[-1][0]))
+
+
+def _flatten(picture: Image.Image) -> Image.Image:
+    # JPEG не поддерживает прозрачность: подкладываем белый фон
+    if picture.mode in ('RGBA', 'LA') or (picture.mode == 'P' and 'transparency' in picture.info):
+        picture = picture.convert('RGBA')
+        background = Image.new('RGB', picture.size, (255, 255, 255))
+        background.paste(picture, mask=picture.getchannel('A'))
+        return background
+    return picture.convert('RGB')
+
+
+def generate_derivatives(image: FieldFile, overwrite: bool = False) -> list[str]:
+    """Создаёт WebP и JPEG копии изображения всех размеров из DERIVATIVES. Возвращает имена созданных файлов."""
+    if not image:
+        return []
+    storage = image.storage
+    with storage.open(image.name, 'rb') as source:
+        picture = _flatten(ImageOps.exif_transpose(Image.open(source)))
+
+    created = []
+    for size, width in DERIVATIVES.items():
+        resized = picture.copy()
+        if resized.width > width:
+            resized.thumbnail((width, resized.height * width // resized.width or 1), Image.Resampling.LANCZOS)
+        for extension, pil_format, _, options in FORMATS:
+            name = derivative_name(image.name, size, extension)
+            if storage.exists(name):
+                if not overwrite:
+                    continue
+                storage.delete(name)
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            created.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return created
+
+
+def ensure_derivatives(image: FieldFile) -> None:
+    """Создаёт копии только что загруженного изображения, если их ещё нет."""
+    if not image or has_derivatives(image):
+        return
+    try:
+        generate_derivatives(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Сохранение модели не должно падать из-за битого файла; копии можно пересоздать командой
+        logger.exception('Не удалось создать копии изображения %s', image.name)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+from notes.text import sanitize_html, html_to_text, build_description
+
+
+class Command(BaseCommand):
+    help = 'Заполняет анонс и описание страницы у статей, сохранённых до их появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересчитать все статьи, а не только незаполненные')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = Note.objects.only('pk', 'content_short', 'meta_description').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(description='')
+
+        batch, total = [], 0
+        for note in queryset.iterator(chunk_size=options['batch_size']):
+            note.excerpt_html = sanitize_html(note.content_short)
+            note.excerpt_text = html_to_text(note.excerpt_html)
+            note.description = build_description(note.meta_description, note.excerpt_text)
+            batch.append(note)
+            if len(batch) >= options['batch_size']:
+                total += Note.objects.bulk_update(batch, ['excerpt_html', 'excerpt_text', 'description'])
+                batch = []
+        if batch:
+            total += Note.objects.bulk_update(batch, ['excerpt_html', 'excerpt_text', 'description'])
+        self.stdout.write(self.style.SUCCESS(f'Обновлено статей: {total}'))
@@ -0,0 +1,132 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from notes import bench
+
+# Метрики, по которым сравниваются прогоны; рост числа запросов к базе - регрессия при любом пороге
+COMPARED = ('p50_ms', 'p95_ms', 'alloc_peak_kib')
+
+
+class Command(BaseCommand):
+    help = ('Замеры публичных страниц (главная, статья, категория, метка, карта сайта и боковая панель): '
+            'задержка, запросы к базе и пик памяти на запрос через тестовый клиент, с кэшем страниц и без него, '
+            'а с --server - нагрузочный прогон запущенного сервера. Результат пишется в JSON; '
+            '"bench --compare старый.json новый.json" находит регрессии. Данные создаёт seed_bench_data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл JSON с результатами; по умолчанию только таблица')
+        parser.add_argument('--iterations', type=int, default=30, help='Запросов на страницу в каждом режиме')
+        parser.add_argument('--target', action='append', dest='targets',
+                            help='Замерять только эти страницы (home, post, category, tag, sitemap, sidebar)')
+        parser.add_argument('--server', help='Адрес запущенного сервера (WSGI или ASGI) для нагрузочного прогона')
+        parser.add_argument('--requests', type=int, default=1000, help='Запросов нагрузочного прогона')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--label', default='', help='Подпись прогона, например ветка или wsgi/asgi')
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Сравнить два файла результатов')
+        parser.add_argument('--threshold', type=float, default=0.15,
+                            help='Допустимый относительный рост задержки и памяти при сравнении')
+        parser.add_argument('--min-delta', type=float, default=0.5,
+                            help='Рост задержки меньше стольких миллисекунд не считается регрессией: '
+                                 'страницы из кэша отвечают за доли миллисекунды, и их шум превышает любой порог')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(*options['compare'], options['threshold'], options['min_delta'])
+            return
+
+        targets = bench.default_targets()
+        selected = options['targets'] or [*targets, 'sidebar']
+        unknown = set(selected) - {*targets, 'sidebar'}
+        if unknown:
+            raise CommandError(f'Нет страниц для замера: {", ".join(sorted(unknown))} (создайте данные seed_bench_data)')
+
+        results = {'meta': self.meta(options['label']), 'client': {}}
+        client = Client()
+        for name in selected:
+            results['client'][name] = {}
+            for mode in ('cold', 'warm'):
+                if name == 'sidebar':
+                    measured = bench.measure_sidebar(options['iterations'], cold=mode == 'cold')
+                else:
+                    measured = bench.measure_page(client, targets[name], options['iterations'], cold=mode == 'cold')
+                results['client'][name][mode] = measured
+                self.stdout.write(f'{name:<10} {mode:<5} p50 {measured["p50_ms"]:>8.2f} мс  p95 {measured["p95_ms"]:>8.2f} мс  '
+                                  f'запросов {measured["queries"]:>3}  память {measured["alloc_peak_kib"]:>8.1f} КиБ')
+
+        if options['server']:
+            paths = [targets[name] for name in selected if name in targets]
+            try:
+                load, elapsed = bench.run_load(options['server'], paths, options['requests'], options['concurrency'],
+                                               warmup=options['concurrency'])
+            except ValueError as error:
+                raise CommandError(error)
+            results['server'] = {'url': options['server'], 'concurrency': options['concurrency'],
+                                 'paths': bench.summarize_load(load, elapsed)}
+            total = results['server']['paths']['total']
+            self.stdout.write(f'сервер: {total["rps"]} запр/с, p50 {total["p50_ms"]} мс, p99 {total["p99_ms"]} мс, '
+                              f'ошибок {total["errors"]}')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+
+    @staticmethod
+    def meta(label: str) -> dict:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = ''
+        return {
+            'label': label,
+            'commit': commit,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'data': bench.data_size(),
+            'settings': {name: getattr(settings, name, None) for name in (
+                'DEBUG', 'ASYNC_PUBLIC_VIEWS', 'NOTES_PAGINATION_MODE', 'NOTES_PAGINATION_COUNT',
+            )},
+        }
+
+    def compare(self, base_path: str, new_path: str, threshold: float, min_delta: float) -> None:
+        try:
+            with open(base_path, encoding='utf-8') as file:
+                base = json.load(file)
+            with open(new_path, encoding='utf-8') as file:
+                new = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать результаты: {error}')
+        if base['meta']['data'] != new['meta']['data']:
+            self.stdout.write(self.style.WARNING('Прогоны сделаны на разных данных, сравнение приблизительное'))
+
+        regressions = []
+        self.stdout.write(f'{"страница":<18} {"метрика":<15} {"было":>10} {"стало":>10} {"изменение":>10}')
+        for name, modes in new['client'].items():
+            for mode, measured in modes.items():
+                before = base['client'].get(name, {}).get(mode)
+                if before is None:
+                    continue
+                for metric in ('queries', *COMPARED):
+                    old, current = before[metric], measured[metric]
+                    change = (current - old) / old if old else 0.0
+                    if metric == 'queries':
+                        worse = current > old
+                    else:
+                        worse = change > threshold and not (metric.endswith('_ms') and current - old < min_delta)
+                    if worse:
+                        regressions.append(f'{name}/{mode} {metric}')
+                    style = self.style.ERROR if worse else (lambda text: text)
+                    self.stdout.write(style(f'{name + "/" + mode:<18} {metric:<15} {old:>10} {current:>10} {change:>+10.1%}'))
+
+        if regressions:
+            raise CommandError(f'Регрессии (порог {threshold:.0%}): {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from notes.images import generate_derivatives
+from notes.models import Note
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные WebP и JPEG копии изображений статей и фотографий пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Пересоздать уже существующие копии')
+
+    def handle(self, *args, **options):
+        sources = (
+            (Note.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image'), 'image'),
+            (User.objects.exclude(photo='').exclude(photo__isnull=True).only('pk', 'photo'), 'photo'),
+        )
+        created = failed = 0
+        for queryset, field in sources:
+            for obj in queryset.iterator():
+                image = getattr(obj, field)
+                try:
+                    created += len(generate_derivatives(image, overwrite=options['overwrite']))
+                except (OSError, ValueError, Image.DecompressionBombError) as e:
+                    failed += 1
+                    self.stderr.write(f'{image.name}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Создано файлов: {created}, ошибок: {failed}'))
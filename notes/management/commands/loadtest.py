@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.bench import LoadResult, run_load, summarize_load
+from notes.models import Note, TagPost, Category
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон публичных страниц запущенного сервера: p50/p99 и запросы в секунду. '
+            'Для сравнения WSGI и ASGI запустите, например, "gunicorn choocha.wsgi -w 4" и '
+            '"uvicorn choocha.asgi:application --workers 4" (с ASYNC_PUBLIC_VIEWS = True) и прогоните команду против каждого.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='?', default='http://127.0.0.1:8000')
+        parser.add_argument('--requests', type=int, default=1000, help='Всего запросов')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных соединений')
+        parser.add_argument('--warmup', type=int, default=50, help='Запросов до начала замера')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Адрес страницы; по умолчанию главная, статья, категория, метка и robots.txt')
+        parser.add_argument('--cookie', default='',
+                            help='Cookie запросов, например "sessionid=...": авторизованные страницы не берутся '
+                                 'из кэша AnonymousPageCacheMiddleware')
+        parser.add_argument('--label', default='', help='Подпись прогона в отчёте (wsgi, asgi)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        headers = {'Cookie': options['cookie']} if options['cookie'] else {}
+        try:
+            results, elapsed = run_load(options['base_url'], paths, options['requests'], options['concurrency'],
+                                        warmup=options['warmup'], headers=headers)
+        except ValueError as error:
+            raise CommandError(error)
+        self.report(results, elapsed, options['label'])
+
+    @staticmethod
+    def default_paths() -> list[str]:
+        paths = ['/']
+        note = Note.published.values_list('slug', flat=True).first()
+        category = Category.objects.filter(published_count__gt=0).values_list('slug', flat=True).first()
+        tag = TagPost.objects.filter(published_count__gt=0).values_list('slug', flat=True).first()
+        paths += [f'/post/{note}/'] if note else []
+        paths += [f'/category/{category}/'] if category else []
+        paths += [f'/tag/{tag}/'] if tag else []
+        return paths + ['/robots.txt']
+
+    def report(self, results: list[LoadResult], elapsed: float, label: str) -> None:
+        title = f'[{label}] ' if label else ''
+        self.stdout.write(f'{title}{len(results)} запросов за {elapsed:.2f} с: {len(results) / elapsed:.1f} запр/с')
+        self.stdout.write(f'{"адрес":<40} {"запросов":>8} {"ошибок":>7} {"p50, мс":>9} {"p99, мс":>9}')
+        for path, summary in summarize_load(results, elapsed).items():
+            path = 'всего' if path == 'total' else path
+            self.stdout.write(f'{path[:40]:<40} {summary["requests"]:>8} {summary["errors"]:>7} '
+                              f'{summary["p50_ms"]:>9.1f} {summary["p99_ms"]:>9.1f}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes.cache import SIDEBAR, bump_generation
+from notes.counters import recount_categories, recount_tags
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает количество опубликованных статей у категорий и меток'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            categories = recount_categories()
+            tags = recount_tags()
+        bump_generation(SIDEBAR)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано категорий: {categories}, меток: {tags}'))
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from notes.cache import note_tag, bump_generations
+from notes.models import Note, RelatedNote
+from notes.related import IDF_KEY, recompute
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие статьи для всех опубликованных статей'
+
+    def handle(self, *args, **options):
+        cache.delete(IDF_KEY)
+        RelatedNote.objects.filter(Q(note__is_published=False) | Q(related__is_published=False)).delete()
+        changed = set()
+        pks = list(Note.published.values_list('pk', flat=True))
+        for pk in pks:
+            # Пересчитываются все статьи, поэтому каскад по соседям не нужен
+            changed |= recompute(pk, cascade=False)
+        bump_generations(map(note_tag, changed))
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано статей: {len(pks)}, изменилось списков: {len(changed)}'))
@@ -0,0 +1,139 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from notes.cache import SIDEBAR, NOTES, SITEMAP, bump_generations
+from notes.models import Note, RelatedNote, TagPost, Category
+from notes.search import SEARCH_CONFIG
+
+# Слаги синтетических записей: по ним данные находятся и удаляются, не задевая настоящие
+PREFIX = 'bench-'
+WORDS = ['кэш', 'индекс', 'запрос', 'шаблон', 'страница', 'статья', 'метка', 'категория', 'сервер', 'база',
+         'python', 'django', 'postgres', 'redis', 'поиск', 'вектор', 'очередь', 'профиль', 'нагрузка', 'задержка',
+         'память', 'поток', 'соединение', 'транзакция', 'миграция', 'модель', 'форма', 'сессия', 'ответ', 'сигнал']
+SHORT_WORDS = 30
+FULL_WORDS = 150
+
+
+def words_sql(count: int, salt: int) -> str:
+    """Выражение SQL с count псевдослучайными словами для статьи с номером n."""
+    return (f"(SELECT string_agg((%(words)s::text[])[1 + (n * {salt} + i * 7) %% cardinality(%(words)s::text[])], ' ') "
+            f"FROM generate_series(1, {count}) i)")
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетические категории, метки и статьи для замеров (команда bench). '
+            'Данные вставляются запросами generate_series на стороне Postgres, без сигналов моделей: '
+            'миллион статей занимает минуты, а не часы. Записи отмечены слагом с префиксом "bench-"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=1000, help='Статей, например 1000, 100000 или 1000000')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--tags-per-note', type=int, default=3)
+        parser.add_argument('--draft-every', type=int, default=20, help='Каждая N-я статья - черновик (0 - без черновиков)')
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--clear', action='store_true', help='Удалить синтетические данные и не создавать новые')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Синтетические данные создаются только в PostgreSQL: поиск и индексы меток требуют его')
+        if options['tags_per_note'] > options['tags']:
+            raise CommandError('--tags-per-note не может быть больше --tags')
+
+        deleted = self.clear()
+        if options['clear']:
+            self.finish()
+            self.stdout.write(self.style.SUCCESS(f'Удалено синтетических статей: {deleted}'))
+            return
+
+        with transaction.atomic():
+            category_ids = self.create_named(Category, 'name', 'Bench category', options['categories'])
+            tag_ids = self.create_named(TagPost, 'tag', 'bench tag', options['tags'])
+        created = 0
+        while created < options['notes']:
+            size = min(options['batch_size'], options['notes'] - created)
+            with transaction.atomic():
+                self.create_notes(created + 1, created + size, category_ids, tag_ids, options)
+            created += size
+            self.stdout.write(f'Создано статей: {created} из {options["notes"]}')
+
+        call_command('rebuild_counters', stdout=self.stdout)
+        self.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано категорий: {len(category_ids)}, меток: {len(tag_ids)}, статей: {created}'))
+
+    @staticmethod
+    def clear() -> int:
+        notes = Note.objects.filter(slug__startswith=PREFIX)
+        with transaction.atomic():
+            # Прямое удаление без сбора объектов: каскад ORM для миллиона статей не поместится в память
+            RelatedNote.objects.filter(note__in=notes)._raw_delete(connection.alias)
+            RelatedNote.objects.filter(related__in=notes)._raw_delete(connection.alias)
+            Note.tags.through.objects.filter(note__in=notes)._raw_delete(connection.alias)
+            Note.tags.through.objects.filter(tagpost__slug__startswith=PREFIX)._raw_delete(connection.alias)
+            deleted = notes._raw_delete(connection.alias)
+            TagPost.objects.filter(slug__startswith=PREFIX)._raw_delete(connection.alias)
+            Category.objects.filter(slug__startswith=PREFIX)._raw_delete(connection.alias)
+        return deleted
+
+    @staticmethod
+    def create_named(model, name_field: str, name: str, count: int) -> list[int]:
+        table, quote = model._meta.db_table, connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(table)} ({quote(name_field)}, slug, published_count) '
+                f"SELECT %s || ' ' || i, %s || i, 0 FROM generate_series(1, %s) i RETURNING id",
+                [name, f'{PREFIX}{model._meta.model_name}-', count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def create_notes(first: int, last: int, category_ids: list[int], tag_ids: list[int], options: dict) -> None:
+        quote = connection.ops.quote_name
+        through = Note.tags.through._meta
+        draft_every = options['draft_every']
+        short, full = words_sql(SHORT_WORDS, 31), words_sql(FULL_WORDS, 17)
+        params = {
+            'first': first, 'last': last, 'words': WORDS, 'categories': category_ids, 'tags': tag_ids,
+            'draft_every': draft_every or last + 1, 'prefix': f'{PREFIX}note-', 'config': SEARCH_CONFIG,
+        }
+        with connection.cursor() as cursor:
+            # Статьи идут от новых к старым: у статьи с номером n дата создания на n минут раньше
+            cursor.execute(f"""
+                WITH source AS (
+                    SELECT n, 'Bench note ' || n AS title, {short} AS short_text, {full} AS full_text
+                    FROM generate_series(%(first)s, %(last)s) n
+                )
+                INSERT INTO {quote(Note._meta.db_table)} (
+                    title, slug, content_short, content_full, time_create, time_update, is_published,
+                    cat_id, meta_description, excerpt_html, excerpt_text, description, search_vector
+                )
+                SELECT
+                    title, %(prefix)s || n, '<p>' || short_text || '</p>', '<p>' || full_text || '</p>',
+                    now() - n * interval '1 minute', now() - n * interval '1 minute', n %% %(draft_every)s <> 0,
+                    (%(categories)s::bigint[])[1 + n %% cardinality(%(categories)s::bigint[])],
+                    '', '<p>' || short_text || '</p>', short_text, left(short_text, 160),
+                    setweight(to_tsvector(%(config)s::regconfig, title), 'A')
+                    || setweight(to_tsvector(%(config)s::regconfig, short_text), 'B')
+                    || setweight(to_tsvector(%(config)s::regconfig, full_text), 'C')
+                FROM source
+            """, params)
+            # Соседние смещения (n * 7 + j) различны, поэтому пары статья-метка не повторяются
+            cursor.execute(f"""
+                INSERT INTO {quote(through.db_table)} (note_id, tagpost_id)
+                SELECT note.id, (%(tags)s::bigint[])[1 + (n * 7 + j) %% cardinality(%(tags)s::bigint[])]
+                FROM (
+                    SELECT id, substr(slug, length(%(prefix)s) + 1)::bigint AS n
+                    FROM {quote(Note._meta.db_table)}
+                    WHERE slug IN (SELECT %(prefix)s || n FROM generate_series(%(first)s, %(last)s) n)
+                ) note, generate_series(0, %(tags_per_note)s - 1) j
+            """, {**params, 'tags_per_note': options['tags_per_note']})
+
+    @staticmethod
+    def finish() -> None:
+        # Свежая статистика планировщика и сброс кэшей страниц, фрагментов и карты сайта
+        with connection.cursor() as cursor:
+            for model in (Category, TagPost, Note, Note.tags.through):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        bump_generations([SIDEBAR, NOTES, SITEMAP])
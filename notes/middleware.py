@@ -0,0 +1,87 @@
+# choocha\notes\middleware.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_http_date_safe
+
+from .cache import SIDEBAR, NOTES, SITEMAP, note_tag, category_tag, tagpost_tag, generation_key, get_generations
+
+# Кэшируемые страницы: имя маршрута -> группы кэша, от которых зависит страница.
+# Группы вычисляются из параметров URL, поэтому их поколения читаются до того,
+# как представление обратится к базе, и изменение во время рендера не попадёт в кэш как актуальное
+CACHED_VIEWS = {
+    'home': lambda kwargs: (SIDEBAR, NOTES),
+    'post': lambda kwargs: (SIDEBAR, note_tag(kwargs['post_slug'])),
+    'category': lambda kwargs: (SIDEBAR, category_tag(kwargs['cat_slug'])),
+    'tag': lambda kwargs: (SIDEBAR, tagpost_tag(kwargs['tag_slug'])),
+    'about': lambda kwargs: (SIDEBAR,),
+    'django.contrib.sitemaps.views.index': lambda kwargs: (SITEMAP,),
+    'django.contrib.sitemaps.views.sitemap': lambda kwargs: (SITEMAP,),
+}
+
+# Заголовки, которые не сохраняются: Vary выставят внешние middleware заново
+SKIPPED_HEADERS = ('vary', 'set-cookie', 'x-page-cache')
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """
+    Кэш целых страниц для анонимных GET-запросов к страницам из CACHED_VIEWS.
+    Запись хранит поколения своих групп и перестаёт выдаваться, когда сигналы моделей
+    увеличивают поколение любой из них. Авторизованные пользователи, ответы с cookie
+    и страницы с CSRF-токеном не кэшируются.
+    Должен стоять после AuthenticationMiddleware и DebugToolbarMiddleware.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        dependencies = CACHED_VIEWS.get(match.url_name) if match else None
+        if dependencies is None or request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return None
+
+        tags = dependencies(view_kwargs)
+        key = 'notes:page:' + hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        found = cache.get_many([key, *map(generation_key, tags)])
+        generations = request._page_generations = get_generations(tags, found)
+        entry = found.get(key)
+        if entry is not None and entry['generations'] == generations:
+            response = HttpResponse(entry['content'], headers=entry['headers'])
+            response['X-Page-Cache'] = 'hit'
+            # Закэшированная страница сохранила ETag и Last-Modified, поэтому на повторный запрос отвечаем 304
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+                response=response,
+            )
+        if request.method == 'GET':
+            request._page_cache = (key, generations)
+        return None
+
+    def process_response(self, request, response):
+        state = getattr(request, '_page_cache', None)
+        if state is None or not self._is_cacheable(request, response):
+            return response
+        key, generations = state
+        cache.set(key, {
+            'generations': generations,
+            'content': response.content,
+            'headers': {name: value for name, value in response.items() if name.lower() not in SKIPPED_HEADERS},
+        }, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    @staticmethod
+    def _is_cacheable(request, response) -> bool:
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+            and 'no-store' not in response.get('Cache-Control', '')
+            # Страница отрисовала CSRF-токен, он уникален для посетителя
+            and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 12:23
+
+import django_ckeditor_5.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_alter_tagpost_slug'),
+    ]
+
+    # Текст статьи из content переходит в content_full: переименование сохраняет данные.
+    # Базы, где столбцы content_full, content_short и meta_description уже созданы вручную,
+    # отмечают миграцию выполненной: manage.py migrate notes 0005 --fake
+    operations = [
+        migrations.RenameField(
+            model_name='note',
+            old_name='content',
+            new_name='content_full',
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='content_full',
+            field=django_ckeditor_5.fields.CKEditor5Field(blank=True, null=True, verbose_name='Полный текст статьи'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='content_short',
+            field=django_ckeditor_5.fields.CKEditor5Field(blank=True, max_length=600, null=True, verbose_name='Краткий текст статьи'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='meta_description',
+            field=models.TextField(blank=True, max_length=160, null=True, verbose_name='Метаописание'),
+        ),
+    ]
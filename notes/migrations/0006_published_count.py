@@ -0,0 +1,45 @@
+# Generated by Django 5.1 on 2026-10-18 12:23
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_published_count(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    Category = apps.get_model('notes', 'Category')
+    TagPost = apps.get_model('notes', 'TagPost')
+
+    def count(queryset, group_by):
+        totals = queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+    Category.objects.update(
+        published_count=count(Note.objects.filter(cat=OuterRef('pk'), is_published=True), 'cat')
+    )
+    TagPost.objects.update(
+        published_count=count(
+            Note.tags.through.objects.filter(tagpost=OuterRef('pk'), note__is_published=True), 'tagpost'
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_remove_note_content_note_content_full_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Опубликованных статей'),
+        ),
+        migrations.AddField(
+            model_name='tagpost',
+            name='published_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Опубликованных статей'),
+        ),
+        migrations.RunPython(fill_published_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 12:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_published_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='note',
+            options={'ordering': ['-time_create', '-id'], 'verbose_name': 'Статья', 'verbose_name_plural': 'Статьи'},
+        ),
+        migrations.RemoveIndex(
+            model_name='note',
+            name='notes_note_title_4445b1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-time_create', '-id'], name='note_published_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['cat', '-time_create', '-id'], name='note_published_cat_idx'),
+        ),
+        # Связующая таблица Note.tags создаётся автоматически, поэтому индекс
+        # (tagpost_id, note_id) для выборки статей по метке добавляем вручную.
+        # Он покрывает запрос: note_id читается прямо из индекса без обращения к таблице
+        migrations.RunSQL(
+            'CREATE INDEX note_tags_tagpost_note_idx ON notes_note_tags (tagpost_id, note_id)',
+            'DROP INDEX note_tags_tagpost_note_idx',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+from notes.text import sanitize_html, html_to_text
+
+
+def fill_excerpts(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    notes = list(Note.objects.only('pk', 'content_short'))
+    for note in notes:
+        note.excerpt_html = sanitize_html(note.content_short)
+        note.excerpt_text = html_to_text(note.excerpt_html)
+    Note.objects.bulk_update(notes, ['excerpt_html', 'excerpt_text'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='excerpt_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Анонс (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='excerpt_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Анонс (текст)'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
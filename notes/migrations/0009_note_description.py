@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_note_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='description',
+            field=models.CharField(blank=True, default='', editable=False, max_length=160, verbose_name='Описание страницы'),
+        ),
+    ]
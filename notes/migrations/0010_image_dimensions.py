@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+from notes.images import image_dimensions
+
+
+def fill_dimensions(apps, schema_editor):
+    # Отсутствующие и повреждённые файлы оставляют размеры пустыми
+    Note = apps.get_model('notes', 'Note')
+    objects = list(Note.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image'))
+    for obj in objects:
+        obj.image_width, obj.image_height = image_dimensions(obj.image)
+    Note.objects.bulk_update(objects, ['image_width', 'image_height'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_note_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 12:39
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+from notes.search import build_search_vector
+
+
+def fill_search_vectors(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    for note in Note.objects.only('pk', 'title', 'content_short', 'content_full').iterator(chunk_size=500):
+        Note.objects.filter(pk=note.pk).update(
+            search_vector=build_search_vector(note.title, note.content_short, note.content_full)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0010_image_dimensions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # Индекс строится после заполнения: так быстрее, чем обновлять его на каждой строке
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='note',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='note_search_vector_idx'),
+        ),
+    ]
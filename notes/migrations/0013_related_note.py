@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-18 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0012_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Позиция')),
+                ('score', models.FloatField(verbose_name='Оценка сходства')),
+                ('note', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='notes.note', verbose_name='Статья')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='notes.note', verbose_name='Похожая статья')),
+            ],
+            options={
+                'verbose_name': 'Похожая статья',
+                'verbose_name_plural': 'Похожие статьи',
+                'ordering': ['note_id', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('note', 'position'), name='related_note_position_uniq')],
+            },
+        ),
+    ]
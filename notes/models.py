@@ -1,10 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.shortcuts import reverse
 from django_ckeditor_5.fields import CKEditor5Field
 from django_extensions.db.fields import AutoSlugField
 from slugify import slugify
 
+from .images import image_dimensions, dimensions_outdated
+from .search import build_search_vector
+from .text import sanitize_html, html_to_text, build_description
+
 
 class PublishedManager(models.Manager):
     def get_queryset(self):
@@ -15,8 +22,12 @@ class TagPost(models.Model):
     class Meta:
         verbose_name = 'Метка'
         verbose_name_plural = 'Метки'
+        # Триграммный индекс для автодополнения (notes.autocomplete): UPPER(...) LIKE '%X%' и поиск с опечатками
+        indexes = [GinIndex(OpClass(Upper('tag'), name='gin_trgm_ops'), name='tagpost_tag_trgm_idx')]
 
     tag = models.CharField(max_length=100, db_index=True)
+    published_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                                  verbose_name='Опубликованных статей')
     slug = AutoSlugField(
         populate_from='tag',
         slugify_function=slugify,
@@ -37,8 +48,11 @@ class Category(models.Model):
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        indexes = [GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='category_name_trgm_idx')]
 
     name = models.CharField(max_length=100, db_index=True, verbose_name='Категория')
+    published_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                                  verbose_name='Опубликованных статей')
     slug = AutoSlugField(
         populate_from='name',
         slugify_function=slugify,
@@ -59,9 +73,23 @@ class Note(models.Model):
     class Meta:
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
-        ordering = ['title', '-time_create']
+        # Списки показываются от новых к старым. Частичные индексы ниже повторяют этот порядок,
+        # поэтому выборки опубликованных статей (в том числе по категории) идут упорядоченным
+        # сканированием индекса без сортировки. Ключ (time_create, id) использует и курсорная пагинация.
+        ordering = ['-time_create', '-id']
         indexes = [
-            models.Index(fields=['title', '-time_create']),
+            models.Index(
+                fields=['-time_create', '-id'],
+                condition=models.Q(is_published=True),
+                name='note_published_recent_idx',
+            ),
+            models.Index(
+                fields=['cat', '-time_create', '-id'],
+                condition=models.Q(is_published=True),
+                name='note_published_cat_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='note_search_vector_idx'),
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='note_title_trgm_idx'),
         ]
 
     class Status(models.IntegerChoices):
@@ -84,6 +112,9 @@ class Note(models.Model):
         verbose_name='Изображение',
         null=True
     )
+    # Размеры хранятся в строке, чтобы админка и шаблоны не открывали файл изображения
+    image_width = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name='Ширина изображения')
+    image_height = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name='Высота изображения')
     content_short = CKEditor5Field(
         max_length=600,
         blank=True,
@@ -119,6 +150,12 @@ class Note(models.Model):
         null=True,
         verbose_name='Метаописание'
     )
+    excerpt_html = models.TextField(blank=True, default='', editable=False, verbose_name='Анонс (HTML)')
+    excerpt_text = models.TextField(blank=True, default='', editable=False, verbose_name='Анонс (текст)')
+    description = models.CharField(max_length=160, blank=True, default='', editable=False,
+                                   verbose_name='Описание страницы')
+    # Заполняется при сохранении, см. notes.search.build_search_vector
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый вектор')
 
 
     objects = models.Manager()
@@ -130,6 +167,29 @@ class Note(models.Model):
     def get_absolute_url(self) -> str:
         return reverse('post', kwargs={'post_slug': self.slug})
 
+    def save(self, *args, **kwargs) -> None:
+        # Анонс для списков и описание страницы готовим один раз при сохранении, а не при каждом показе
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        derived = set()
+        if 'content_short' not in deferred:
+            self.excerpt_html = sanitize_html(self.content_short)
+            self.excerpt_text = html_to_text(self.excerpt_html)
+            derived.update(('excerpt_html', 'excerpt_text'))
+            if 'meta_description' not in deferred:
+                self.description = build_description(self.meta_description, self.excerpt_text)
+                derived.add('description')
+        if 'image' not in deferred and dimensions_outdated(self.image, self.image_width):
+            self.image_width, self.image_height = image_dimensions(self.image)
+            derived.update(('image_width', 'image_height'))
+        if not {'title', 'content_short', 'content_full'} & deferred:
+            self.search_vector = build_search_vector(self.title, self.content_short, self.content_full)
+            derived.add('search_vector')
+        if update_fields is not None and {'title', 'content_short', 'content_full', 'meta_description',
+                                          'image'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
     def get_update_url(self) -> str:
         return reverse('update_post', kwargs={'pk': self.pk})
 
@@ -137,5 +197,28 @@ class Note(models.Model):
         return reverse('delete_post', kwargs={'pk': self.pk})
 
 
+class RelatedNote(models.Model):
+    """Заранее вычисленные похожие статьи (notes.related): position 0 - самая похожая."""
+
+    class Meta:
+        verbose_name = 'Похожая статья'
+        verbose_name_plural = 'Похожие статьи'
+        ordering = ['note_id', 'position']
+        constraints = [
+            # Индекс этого ограничения обслуживает выборку списка для страницы статьи
+            models.UniqueConstraint(fields=['note', 'position'], name='related_note_position_uniq'),
+        ]
+
+    # Отдельный индекс по note не нужен: его заменяет ограничение (note, position)
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='related_links', db_index=False,
+                             verbose_name='Статья')
+    related = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='+', verbose_name='Похожая статья')
+    position = models.PositiveSmallIntegerField(verbose_name='Позиция')
+    score = models.FloatField(verbose_name='Оценка сходства')
+
+    def __str__(self) -> str:
+        return f'{self.note_id} -> {self.related_id}'
+
+
 class UploadFiles(models.Model):
     file = models.FileField(upload_to='uploads_model/', verbose_name='Файл')
@@ -0,0 +1,158 @@
+# choocha\notes\pagination.py
+import base64
+import hashlib
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.paginator import Paginator, EmptyPage, InvalidPage
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+CURSOR_ORDERING = ('-time_create', '-id')  # Совпадает с Note.Meta.ordering и индексами
+COUNT_TIMEOUT = 60 * 5
+
+
+def encode_cursor(obj) -> str:
+    raw = f'{obj.time_create.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        time_create, pk = raw.split('|')
+        return datetime.fromisoformat(time_create), int(pk)
+    except ValueError:  # сюда же попадают binascii.Error и UnicodeDecodeError
+        raise InvalidPage('Неверный курсор страницы')
+
+
+class CursorPage:
+    """Страница курсорной пагинации. Номеров страниц нет, только соседние курсоры."""
+    is_cursor = True
+
+    def __init__(self, object_list: list, has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self) -> str:
+        return f'<CursorPage: {len(self.object_list)} objects>'
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> str | None:
+        return encode_cursor(self.object_list[-1]) if self._has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self) -> str | None:
+        return encode_cursor(self.object_list[0]) if self._has_previous and self.object_list else None
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (time_create, id) вместо OFFSET/LIMIT.
+    Стоимость запроса не зависит от глубины страницы, COUNT(*) не выполняется.
+    """
+
+    def __init__(self, object_list: QuerySet, per_page: int):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def page(self, after: str | None = None, before: str | None = None) -> CursorPage:
+        queryset = self.object_list
+        if before:
+            time_create, pk = decode_cursor(before)
+            rows = list(
+                queryset
+                .filter(Q(time_create__gt=time_create) | Q(time_create=time_create, pk__gt=pk))
+                .order_by('time_create', 'id')[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page][::-1], has_next=True, has_previous=has_previous)
+
+        if after:
+            time_create, pk = decode_cursor(after)
+            queryset = queryset.filter(Q(time_create__lt=time_create) | Q(time_create=time_create, pk__lt=pk))
+        rows = list(queryset.order_by(*CURSOR_ORDERING)[:self.per_page + 1])
+        return CursorPage(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=bool(after))
+
+
+def estimate_count(queryset: QuerySet) -> int | None:
+    """
+    Оценка количества строк без COUNT(*): pg_class.reltuples для запроса без условий
+    и оценка планировщика для запроса с фильтрами. Вне PostgreSQL возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # reltuples равен -1, пока таблицу ни разу не анализировали
+            return int(row[0]) if row and row[0] >= 0 else None
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator, который не выполняет COUNT(*) на каждый запрос.
+    count_mode='cached' - точное число, закэшированное на COUNT_TIMEOUT секунд;
+    count_mode='estimate' - оценка PostgreSQL (см. estimate_count), иначе как 'cached'.
+    """
+
+    def __init__(self, *args, count_mode: str = 'cached', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_mode = count_mode
+
+    @cached_property
+    def count(self) -> int:
+        if self.count_mode == 'estimate':
+            estimate = estimate_count(self.object_list)
+            if estimate is not None:
+                return estimate
+        query = str(self.object_list.order_by().query)
+        key = f'notes:count:{hashlib.md5(query.encode()).hexdigest()}'
+        return cache.get_or_set(key, self.object_list.count, COUNT_TIMEOUT)
+
+    def validate_number(self, number) -> int:
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Количество приблизительное, поэтому страницы за его пределами
+            # проверяются по фактической выборке в page()
+            number = int(float(number))
+            if number < 1:
+                raise
+            return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        page = self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+        if number > 1 and not page.object_list:
+            raise EmptyPage(self.error_messages['no_results'])
+        return page
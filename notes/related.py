@@ -0,0 +1,187 @@
+# choocha\notes\related.py
+import functools
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Min, Sum
+
+from .cache import note_tag, bump_generations
+from .models import Note, RelatedNote, Category
+
+RELATED_LIMIT = 5
+# Вклад одной общей метки - её IDF, log(1 + N / df): редкие метки говорят о сходстве больше частых.
+# Общая категория добавляет CATEGORY_WEIGHT, косинус TF-IDF по тексту (если включён) - TFIDF_WEIGHT
+CATEGORY_WEIGHT = 0.5
+TFIDF_WEIGHT = 2.0
+# Статьи той же категории без общих меток: рассматриваются только самые свежие
+CATEGORY_CANDIDATES = RELATED_LIMIT * 4
+# Сколько чужих списков пересчитывается после изменения одной статьи. У популярной метки
+# кандидатов тысячи, остальные списки обновит следующий запуск rebuild_related
+CASCADE_LIMIT = RELATED_LIMIT * 4
+IDF_TIMEOUT = 60 * 60 * 24
+IDF_KEY = 'notes:related:idf'
+LEXEME = re.compile(r"'((?:[^']|'')+)':([0-9A-D,]+)")
+
+_local = threading.local()
+
+
+def _published_total() -> int:
+    # Сумма счётчиков категорий равна числу опубликованных статей и не требует обхода notes_note
+    return Category.objects.aggregate(total=Sum('published_count'))['total'] or 0
+
+
+def _parse_vector(vector: str | None) -> Counter:
+    """Частоты лексем из текстового вида tsvector: 'слово':1A,5C -> {'слово': 2}."""
+    return Counter({word.replace("''", "'"): positions.count(',') + 1
+                    for word, positions in LEXEME.findall(vector or '')})
+
+
+def _idf() -> dict[str, float]:
+    """IDF лексем по опубликованным статьям. Меняется медленно, поэтому кэшируется на сутки."""
+    idf = cache.get(IDF_KEY)
+    if idf is None:
+        total = _published_total() or 1
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT word, ndoc FROM ts_stat(%s)',
+                [f'SELECT search_vector FROM {Note._meta.db_table} WHERE is_published'],
+            )
+            idf = {word: math.log(1 + total / ndoc) for word, ndoc in cursor.fetchall()}
+        cache.set(IDF_KEY, idf, IDF_TIMEOUT)
+    return idf
+
+
+def _tfidf_similarity(note_pk: int, candidate_pks: Iterable[int]) -> dict[int, float]:
+    idf = _idf()
+    vectors = {}
+    for pk, vector in Note.objects.filter(pk__in=[note_pk, *candidate_pks]).values_list('pk', 'search_vector'):
+        weights = {word: count * idf.get(word, 0.0) for word, count in _parse_vector(vector).items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        vectors[pk] = (weights, norm)
+    weights, norm = vectors.pop(note_pk, ({}, 0.0))
+    similarity = {}
+    for pk, (other, other_norm) in vectors.items():
+        if norm and other_norm:
+            similarity[pk] = sum(weight * other.get(word, 0.0) for word, weight in weights.items()) / (norm * other_norm)
+    return similarity
+
+
+def score_candidates(note: Note) -> dict[int, float]:
+    """Оценки сходства статьи со всеми кандидатами: статьями с общими метками и свежими статьями той же категории."""
+    through = Note.tags.through
+    total = _published_total() or 1
+    tag_weights = {
+        pk: math.log(1 + total / max(count, 1))
+        for pk, count in through.objects.filter(note=note).values_list('tagpost_id', 'tagpost__published_count')
+    }
+    scores = defaultdict(float)
+    categories = {}
+    shared = (through.objects.filter(tagpost__in=tag_weights, note__is_published=True).exclude(note=note)
+              .values_list('note_id', 'tagpost_id', 'note__cat_id'))
+    for pk, tag_pk, cat_pk in shared:
+        scores[pk] += tag_weights[tag_pk]
+        categories[pk] = cat_pk
+    same_category = (Note.published.filter(cat_id=note.cat_id).exclude(pk=note.pk)
+                     .values_list('pk', flat=True)[:CATEGORY_CANDIDATES])
+    for pk in same_category:
+        categories[pk] = note.cat_id
+    for pk, cat_pk in categories.items():
+        scores[pk] += CATEGORY_WEIGHT if cat_pk == note.cat_id else 0.0
+
+    if settings.NOTES_RELATED_TFIDF and scores:
+        for pk, similarity in _tfidf_similarity(note.pk, scores).items():
+            scores[pk] += TFIDF_WEIGHT * similarity
+    return dict(scores)
+
+
+def _store(note: Note, scores: dict[int, float]) -> bool:
+    """Сохраняет первые RELATED_LIMIT кандидатов; возвращает True, если список изменился."""
+    top = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:RELATED_LIMIT]
+    current = list(RelatedNote.objects.filter(note=note).values_list('related_id', flat=True))
+    RelatedNote.objects.filter(note=note).delete()
+    RelatedNote.objects.bulk_create(
+        RelatedNote(note=note, related_id=pk, position=position, score=score)
+        for position, (pk, score) in enumerate(top)
+    )
+    return current != [pk for pk, _ in top]
+
+
+def recompute(note_pk: int, cascade: bool = True) -> set[str]:
+    """
+    Пересчитывает похожие статьи для одной статьи. Оценка симметрична, поэтому при cascade
+    пересчитываются и те статьи, в чей список она теперь попадает или из чьего списка выпадает,
+    но не больше CASCADE_LIMIT. Возвращает слаги статей, чей список изменился.
+    """
+    with transaction.atomic():
+        # Блокировка строки статьи: параллельный пересчёт той же статьи ждёт здесь, а не вставляет
+        # второй список с теми же позициями (related_note_position_uniq)
+        note = (Note.objects.select_for_update().filter(pk=note_pk)
+                .only('pk', 'slug', 'cat_id', 'is_published').first())
+        listed_by = set(RelatedNote.objects.filter(related_id=note_pk).values_list('note_id', flat=True))
+        published = note is not None and note.is_published
+        if not published:
+            RelatedNote.objects.filter(note_id=note_pk).delete()
+            RelatedNote.objects.filter(related_id=note_pk).delete()
+            scores, changed = {}, set()
+        else:
+            scores = score_candidates(note)
+            changed = {note.slug} if _store(note, scores) else set()
+    # Страницы, где статья была показана, выводят её заголовок или уже лишились её строки
+    if not published or cascade:
+        changed |= set(Note.objects.filter(pk__in=listed_by).values_list('slug', flat=True))
+    if not cascade:
+        return changed
+
+    for pk in _cascade_targets(scores, listed_by):
+        changed |= recompute(pk, cascade=False)
+    return changed
+
+
+def _cascade_targets(scores: dict[int, float], listed_by: set[int]) -> list[int]:
+    """
+    Статьи, чьи списки нужно пересчитать: уже показывающие статью (её оценка могла измениться)
+    и те, где новая оценка выше худшей в списке, либо список ещё не заполнен.
+    Первыми идут списки, из которых статья должна выпасть, затем - по убыванию оценки.
+    """
+    lists = (RelatedNote.objects.filter(note__in=scores).values('note')
+             .annotate(worst=Min('score'), size=Count('pk')).values_list('note', 'worst', 'size'))
+    lists = {pk: (worst, size) for pk, worst, size in lists}
+    affected = {pk: scores.get(pk, 0.0) for pk in listed_by}
+    for pk, score in scores.items():
+        worst, size = lists.get(pk, (0.0, 0))
+        if size < RELATED_LIMIT or score > worst:
+            affected[pk] = score
+    return sorted(affected, key=lambda pk: (pk in scores, -affected[pk], pk))[:CASCADE_LIMIT]
+
+
+def _flush(note_pks: frozenset[int], cascade: bool) -> None:
+    # Статьи, уже пересчитанные обработчиком той же фиксации, пропускаются
+    done = _local.done
+    pks = note_pks - done
+    done.update(pks)
+    changed = set()
+    for pk in sorted(pks):
+        changed |= recompute(pk, cascade)
+    bump_generations(map(note_tag, changed))
+
+
+def schedule(note_pks: Iterable[int], cascade: bool = True) -> None:
+    """
+    Откладывает пересчёт до фиксации транзакции: сохранение статьи и её меток в форме
+    идут отдельными запросами, а пересчитать нужно один раз после всех.
+    Каждый вызов регистрирует свой обработчик on_commit, поэтому откат транзакции
+    или точки сохранения отбрасывает и отложенные статьи.
+    Без cascade пересчитываются только сами статьи (см. recompute).
+    """
+    note_pks = frozenset(note_pks)
+    if not note_pks:
+        return
+    # Вызовы идут до фиксации, а пересчёт сигналов не вызывает: прошлая фиксация потока уже обработана
+    _local.done = set()
+    transaction.on_commit(functools.partial(_flush, note_pks, cascade))
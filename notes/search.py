@@ -0,0 +1,47 @@
+# choocha\notes\search.py
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Func, QuerySet, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .text import strip_tags_fast
+
+SEARCH_CONFIG = 'russian'
+# Размер фрагмента с подсветкой в результатах поиска, в словах
+HEADLINE_OPTIONS = {'start_sel': '<mark>', 'stop_sel': '</mark>', 'max_words': 35, 'min_words': 15, 'max_fragments': 2}
+
+
+class StripTags(Func):
+    """Грубое удаление HTML-тегов на стороне базы, только для построения фрагмента с подсветкой."""
+    function = 'regexp_replace'
+    template = "%(function)s(%(expressions)s, '<[^>]*>', ' ', 'g')"
+    output_field = TextField()
+
+
+def build_search_vector(title: str | None, content_short: str | None, content_full: str | None) -> SearchVector:
+    """
+    Поисковый вектор статьи: заголовок (вес A), краткий (B) и полный (C) тексты без разметки.
+    Разметка снимается в Python, поэтому в индекс не попадают имена тегов и атрибуты.
+    """
+    return (
+        SearchVector(Value(title or ''), config=SEARCH_CONFIG, weight='A')
+        + SearchVector(Value(strip_tags_fast(content_short)), config=SEARCH_CONFIG, weight='B')
+        + SearchVector(Value(strip_tags_fast(content_full)), config=SEARCH_CONFIG, weight='C')
+    )
+
+
+def search_query(text: str) -> SearchQuery:
+    # websearch понимает кавычки, OR и минус и не падает на синтаксических ошибках пользователя
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_notes(queryset: QuerySet, text: str, headline: bool = False) -> QuerySet:
+    """Статьи, подходящие под запрос, от наиболее релевантных; фильтр идёт по GIN-индексу search_vector."""
+    query = search_query(text)
+    queryset = queryset.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+    if headline:
+        # ts_headline дорогая функция: Postgres вычисляет её только для строк страницы, уже после LIMIT
+        queryset = queryset.annotate(headline=SearchHeadline(
+            StripTags(Coalesce('content_full', 'content_short', Value(''))),
+            query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS,
+        ))
+    return queryset.order_by('-rank', '-time_create', '-id')
@@ -0,0 +1,160 @@
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import slugs
+from .cache import SIDEBAR, NOTES, SITEMAP, note_tag, category_tag, tagpost_tag, bump_generations
+from .counters import recount_categories, recount_tags
+from .images import ensure_derivatives
+from .models import Note, TagPost, Category, RelatedNote
+from .related import schedule as schedule_related
+
+
+def _note_tag_pks(note: Note) -> list[int]:
+    return list(Note.tags.through.objects.filter(note=note).values_list('tagpost_id', flat=True))
+
+
+def _invalidate(names: Iterable[str]) -> None:
+    # Сбрасываем поколения только после фиксации, иначе параллельный запрос
+    # успеет закэшировать старые данные уже под новым поколением
+    names = set(names)
+    transaction.on_commit(lambda: bump_generations(names))
+
+
+def _listing_tags(cat_pks: Iterable[int], tag_pks: Iterable[int]) -> list[str]:
+    """Группы кэша списков, в которых показывается статья: главная, категории, метки и карта сайта."""
+    return [
+        NOTES,
+        SITEMAP,
+        *map(category_tag, Category.objects.filter(pk__in=cat_pks).values_list('slug', flat=True)),
+        *map(tagpost_tag, TagPost.objects.filter(pk__in=tag_pks).values_list('slug', flat=True)),
+    ]
+
+
+@receiver(pre_save, sender=Note)
+def remember_counted_state(sender, instance: Note, **kwargs) -> None:
+    # Запоминаем прежние категорию и статус, чтобы пересчитать и старую категорию
+    instance._counted_state = None
+    if instance.pk:
+        instance._counted_state = (
+            Note.objects.filter(pk=instance.pk).values_list('cat_id', 'is_published').first()
+        )
+
+
+@receiver(post_save, sender=Note)
+def update_counters_on_save(sender, instance: Note, created: bool, **kwargs) -> None:
+    previous = getattr(instance, '_counted_state', None)
+    cat_pks = {instance.cat_id}
+    if previous:
+        cat_pks.add(previous[0])
+    recount_categories(cat_pks)
+    if not created and (previous is None or previous[1] != instance.is_published):
+        recount_tags(_note_tag_pks(instance))
+
+
+@receiver(post_save, sender=Note)
+def invalidate_note_pages(sender, instance: Note, **kwargs) -> None:
+    previous = getattr(instance, '_counted_state', None)
+    names = [note_tag(instance.slug)]
+    # Черновик не виден ни в одном списке и не входит в счётчики боковой панели,
+    # пока не опубликован или не снят с публикации
+    if instance.is_published or (previous and previous[1]):
+        cat_pks = {instance.cat_id, previous[0]} if previous else {instance.cat_id}
+        names += _listing_tags(cat_pks, _note_tag_pks(instance))
+        if previous != (instance.cat_id, instance.is_published):
+            names.append(SIDEBAR)
+    _invalidate(names)
+
+
+@receiver(post_save, sender=Note)
+def build_note_image_derivatives(sender, instance: Note, update_fields=None, **kwargs) -> None:
+    # Сохранения отдельных полей (смена статуса, заполнение описания) изображение не меняют
+    if (update_fields is None or 'image' in update_fields) and 'image' not in instance.get_deferred_fields():
+        ensure_derivatives(instance.image)
+
+
+@receiver(post_save, sender=Note)
+def update_related_on_save(sender, instance: Note, **kwargs) -> None:
+    # Пересчёт идёт после фиксации. Формы сохраняют статью и метки в одной транзакции
+    # (админка, AddPost, UpdatePost), поэтому к этому моменту метки уже сохранены
+    schedule_related([instance.pk])
+
+
+@receiver(pre_delete, sender=Note)
+def remember_deleted_tags(sender, instance: Note, **kwargs) -> None:
+    # Строки связующей таблицы удаляются раньше post_delete
+    instance._counted_tag_pks = _note_tag_pks(instance)
+    instance._related_listed_by = list(RelatedNote.objects.filter(related=instance).values_list('note_id', flat=True))
+
+
+@receiver(post_delete, sender=Note)
+def update_counters_on_delete(sender, instance: Note, **kwargs) -> None:
+    recount_categories([instance.cat_id])
+    recount_tags(getattr(instance, '_counted_tag_pks', []))
+
+
+@receiver(post_delete, sender=Note)
+def update_related_on_delete(sender, instance: Note, **kwargs) -> None:
+    schedule_related(getattr(instance, '_related_listed_by', []))
+
+
+@receiver(post_delete, sender=Note)
+def invalidate_deleted_note_pages(sender, instance: Note, **kwargs) -> None:
+    names = [note_tag(instance.slug)]
+    if instance.is_published:
+        names += [SIDEBAR, *_listing_tags([instance.cat_id], getattr(instance, '_counted_tag_pks', []))]
+    _invalidate(names)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def update_counters_on_tags_change(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            recount_tags([instance.pk])
+    elif action == 'pre_clear':
+        instance._counted_tag_pks = _note_tag_pks(instance)
+    elif action == 'post_clear':
+        recount_tags(getattr(instance, '_counted_tag_pks', []))
+    elif action in ('post_add', 'post_remove'):
+        recount_tags(pk_set)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def invalidate_pages_on_tags_change(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Счётчики меток в боковой панели меняются, только если среди статей есть опубликованные
+    if reverse:
+        notes = list(Note.objects.filter(pk__in=pk_set or []).values_list('slug', 'is_published'))
+        names = [tagpost_tag(instance.slug), *(note_tag(slug) for slug, _ in notes)]
+        # После снятия метки со всех статей их уже не найти: считаем, что опубликованные были
+        published = pk_set is None or any(is_published for _, is_published in notes)
+    else:
+        tag_pks = getattr(instance, '_counted_tag_pks', []) if action == 'post_clear' else pk_set
+        names = [note_tag(instance.slug), *map(tagpost_tag, TagPost.objects.filter(pk__in=tag_pks)
+                                                .values_list('slug', flat=True))]
+        published = instance.is_published
+    _invalidate([SIDEBAR, *names] if published else names)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def update_related_on_tags_change(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_related((pk_set or []) if reverse else [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=TagPost)
+def invalidate_sidebar(sender, **kwargs) -> None:
+    # Названия категорий и меток выводятся в боковой панели, а значит, на всех страницах
+    _invalidate([SIDEBAR, SITEMAP])
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=TagPost)
+def forget_slugs(sender, **kwargs) -> None:
+    # Карта перечитывается после фиксации, иначе в неё могла бы попасть незафиксированная строка
+    slug_map = slugs.categories if sender is Category else slugs.tags
+    transaction.on_commit(slug_map.invalidate)
@@ -1,29 +1,67 @@
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Max, Q
+from django.urls import reverse
+
 from .models import Note, TagPost, Category
 
+# Адресов на одной странице раздела; индекс sitemap.xml ссылается на все страницы
+SITEMAP_PAGE_SIZE = 5000
+
 
-class NoteSitemap(Sitemap):
+class SlugSitemap(Sitemap):
+    """
+    Раздел карты сайта из кортежей (slug, lastmod), выбранных через values_list:
+    объекты моделей не создаются, адрес строится по имени маршрута.
+    """
     changefreq = 'weekly'
     priority = 0.9
+    limit = SITEMAP_PAGE_SIZE
+    url_name = None
+    url_kwarg = None
 
-    def items(self):
-        return Note.published.all()
+    def location(self, item: tuple) -> str:
+        return reverse(self.url_name, kwargs={self.url_kwarg: item[0]})
 
+    def lastmod(self, item: tuple):
+        return item[1]
 
-    def lastmod(self, obj):
-        return obj.time_update
+    def get_latest_lastmod(self):
+        # Стандартная реализация перебирает все элементы раздела ради одного максимума
+        return Note.published.aggregate(last=Max('time_update'))['last']
 
-class TagSitemap(Sitemap):
-    changefreq = 'weekly'
-    priority = 0.9
+
+class NoteSitemap(SlugSitemap):
+    url_name = 'post'
+    url_kwarg = 'post_slug'
 
     def items(self):
-        return TagPost.objects.all().order_by('tag')
+        # Порядок частичного индекса note_published_recent_idx: страницы раздела стабильны и без сортировки
+        return Note.published.order_by('-time_create', '-id').values_list('slug', 'time_update')
 
-class CategorySitemap(Sitemap):
-    changefreq = 'weekly'
-    priority = 0.9
+
+class TagSitemap(SlugSitemap):
+    url_name = 'tag'
+    url_kwarg = 'tag_slug'
 
     def items(self):
-        return Category.objects.all().order_by('name')
+        # lastmod метки - время изменения её самой свежей опубликованной статьи
+        return (TagPost.objects.filter(published_count__gt=0)
+                .annotate(lastmod=Max('notes__time_update', filter=Q(notes__is_published=True)))
+                .order_by('tag', 'pk').values_list('slug', 'lastmod'))
+
+
+class CategorySitemap(SlugSitemap):
+    url_name = 'category'
+    url_kwarg = 'cat_slug'
+
+    def items(self):
+        return (Category.objects.filter(published_count__gt=0)
+                .annotate(lastmod=Max('posts__time_update', filter=Q(posts__is_published=True)))
+                .order_by('name', 'pk').values_list('slug', 'lastmod'))
+
 
+SITEMAPS = {
+    'notes': NoteSitemap,
+    'tags': TagSitemap,
+    'categories': CategorySitemap,
+}
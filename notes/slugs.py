@@ -0,0 +1,114 @@
+# choocha\notes\slugs.py
+import time
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import Model
+from django.http import Http404
+
+from .models import TagPost, Category
+
+SLUG_MAP_TTL = 60 * 5
+SLUG_MISS_TTL = 10  # Неизвестный слаг повторно ищется в базе не чаще раза в 10 секунд
+SLUG_MISS_LIMIT = 1000  # Больше промахов не запоминается: перебор адресов не раздувает память процесса
+
+
+class SlugEntry(NamedTuple):
+    pk: int
+    name: str
+
+
+class SlugMap:
+    """
+    Карта слаг -> (id, название) в памяти процесса: страницы категорий и меток узнают id
+    без запроса к базе и фильтруют статьи по индексированному внешнему ключу.
+    Сигналы сохранения и удаления сбрасывают карту в своём процессе, остальные процессы
+    перечитывают её не позже чем через SLUG_MAP_TTL секунд. Слаг, которого нет в карте
+    (например, новая категория из другого процесса), ищется в базе отдельным запросом,
+    если карта загружена больше SLUG_MISS_TTL секунд назад, а промах запоминается
+    на SLUG_MISS_TTL секунд (не больше SLUG_MISS_LIMIT промахов).
+    """
+
+    def __init__(self, model: type[Model], name_field: str, ttl: int = SLUG_MAP_TTL):
+        self.model = model
+        self.name_field = name_field
+        self.ttl = ttl
+        self._entries: dict[str, SlugEntry] | None = None
+        self._loaded_at = 0.0
+        self._misses: dict[str, float] = {}
+
+    def _current(self) -> dict[str, SlugEntry] | None:
+        # Ссылка читается один раз: invalidate() из другого потока не обнулит её посреди поиска
+        entries = self._entries
+        if entries is None or time.monotonic() - self._loaded_at >= self.ttl:
+            return None
+        return entries
+
+    def reload(self) -> dict[str, SlugEntry]:
+        rows = self.model.objects.values_list('slug', 'pk', self.name_field)
+        self._entries = entries = {slug: SlugEntry(pk, name) for slug, pk, name in rows}
+        self._loaded_at = time.monotonic()
+        self._misses = {}
+        return entries
+
+    def _should_look_up(self, slug: str) -> bool:
+        now = time.monotonic()
+        return now - self._loaded_at >= SLUG_MISS_TTL and now - self._misses.get(slug, 0.0) >= SLUG_MISS_TTL
+
+    def invalidate(self) -> None:
+        self._entries = None
+        self._misses = {}
+
+    def get(self, slug: str) -> SlugEntry | None:
+        entries = self._current()
+        if entries is None:
+            entries = self.reload()
+        entry = entries.get(slug)
+        if entry is None and self._should_look_up(slug):
+            row = self.model.objects.filter(slug=slug).values_list('pk', self.name_field).first()
+            if row is None:
+                if len(self._misses) >= SLUG_MISS_LIMIT:
+                    self._misses = {}
+                self._misses[slug] = time.monotonic()
+            else:
+                entry = entries[slug] = SlugEntry(*row)
+        return entry
+
+    async def aget(self, slug: str) -> SlugEntry | None:
+        # Попадание в свежую карту обходится без перехода в поток
+        entries = self._current()
+        if entries is not None and (slug in entries or not self._should_look_up(slug)):
+            return entries.get(slug)
+        return await sync_to_async(self.get)(slug)
+
+
+categories = SlugMap(Category, 'name')
+tags = SlugMap(TagPost, 'tag')
+
+
+def get_category_or_404(slug: str) -> SlugEntry:
+    category = categories.get(slug)
+    if category is None:
+        raise Http404('Категория не найдена')
+    return category
+
+
+def get_tag_or_404(slug: str) -> SlugEntry:
+    tag = tags.get(slug)
+    if tag is None:
+        raise Http404('Метка не найдена')
+    return tag
+
+
+async def aget_category_or_404(slug: str) -> SlugEntry:
+    category = await categories.aget(slug)
+    if category is None:
+        raise Http404('Категория не найдена')
+    return category
+
+
+async def aget_tag_or_404(slug: str) -> SlugEntry:
+    tag = await tags.aget(slug)
+    if tag is None:
+        raise Http404('Метка не найдена')
+    return tag
@@ -0,0 +1,72 @@
+// choocha\notes\static\notes\js\autocomplete.js
+// Подсказки для полей с data-autocomplete-url (см. notes.views.autocomplete_view).
+// data-autocomplete-target - id <select multiple>, в который добавляется выбранная подсказка;
+// без него выбор подсказки со ссылкой открывает страницу.
+(function () {
+    'use strict';
+
+    const DELAY = 200;
+    const MIN_LENGTH = 2;
+
+    function bind(input) {
+        // Скрипт может подключаться и страницей, и виджетом формы
+        if (input.dataset.autocompleteBound) {
+            return;
+        }
+        input.dataset.autocompleteBound = 'true';
+        const datalist = document.getElementById(input.getAttribute('list'));
+        const target = document.getElementById(input.dataset.autocompleteTarget || '');
+        let results = [];
+        let timer = null;
+        let controller = null;
+
+        function load() {
+            const query = input.value.trim();
+            if (query.length < MIN_LENGTH) {
+                return;
+            }
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const url = new URL(input.dataset.autocompleteUrl, window.location.origin);
+            url.searchParams.set('q', query);
+            fetch(url, {signal: controller.signal, headers: {'Accept': 'application/json'}})
+                .then((response) => response.ok ? response.json() : {results: []})
+                .then((data) => {
+                    results = data.results;
+                    datalist.replaceChildren(...results.map((item) => new Option(item.text)));
+                })
+                .catch(() => {});
+        }
+
+        function choose() {
+            const item = results.find((result) => result.text === input.value);
+            if (!item) {
+                return;
+            }
+            if (!target) {
+                window.location.href = item.url;
+                return;
+            }
+            const value = String(item.id);
+            let option = Array.from(target.options).find((opt) => opt.value === value);
+            if (!option) {
+                option = new Option(item.text, value);
+                target.add(option);
+            }
+            option.selected = true;
+            input.value = '';
+        }
+
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(load, DELAY);
+        });
+        input.addEventListener('change', choose);
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('input[data-autocomplete-url]').forEach(bind);
+    });
+})();
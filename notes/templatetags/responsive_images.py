@@ -0,0 +1,32 @@
+from django import template
+from django.db.models.fields.files import FieldFile
+
+from notes.images import FORMATS, derivative_url, srcset_widths
+
+register = template.Library()
+
+
+@register.inclusion_tag('notes/responsive_image.html')
+def responsive_image(image: FieldFile, size: str = 'list', sizes: str = '100vw', alt: str = '', css_class: str = '',
+                     width=None, height=None, display_width=None) -> dict:
+    """
+    <picture> с WebP и JPEG копиями изображения (см. notes.images).
+    size - копия для атрибута src, sizes - ширина слота в разметке для выбора копии браузером.
+    width и height - размеры оригинала из строки модели: по ним браузер резервирует место до загрузки.
+    display_width - ширина, до которой изображение уменьшается на странице; высота пересчитывается пропорционально.
+    """
+    (webp, _, webp_type, _), (jpeg, _, _, _) = FORMATS
+    widths = srcset_widths(width)
+    if display_width and width and height:
+        width, height = display_width, round(height * display_width / width)
+    return {
+        'webp_type': webp_type,
+        'webp_srcset': ', '.join(f'{derivative_url(image, name, webp)} {w}w' for name, w in widths.items()),
+        'jpeg_srcset': ', '.join(f'{derivative_url(image, name, jpeg)} {w}w' for name, w in widths.items()),
+        'src': derivative_url(image, size, jpeg),
+        'sizes': sizes,
+        'alt': alt,
+        'css_class': css_class,
+        'width': width,
+        'height': height,
+    }
@@ -1,28 +1,37 @@
 from django import template
-from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString
 
+from notes.cache import SIDEBAR, get_fragment
 from notes.models import Category, TagPost
 
 register = template.Library()
 
 
-@register.inclusion_tag('notes/list_categories.html')
-def show_categories(cat_selected=0):
+def _render_categories(cat_selected) -> str:
     cats = (
         Category.objects
-        .annotate(total=Count('posts', filter=Q(posts__is_published=True)))
-        .filter(total__gt=0)
+        .filter(published_count__gt=0)
         .order_by('name')  # Добавили сортировку по полю 'name'
     )
-    return {'cats': cats, 'cat_selected': cat_selected}
+    return render_to_string('notes/list_categories.html', {'cats': cats, 'cat_selected': cat_selected})
 
 
-@register.inclusion_tag('notes/list_tags.html')
-def show_all_tags():
+def _render_tags() -> str:
     tags = (
         TagPost.objects
-        .annotate(total=Count('notes', filter=Q(notes__is_published=True)))
-        .filter(total__gt=0)
+        .filter(published_count__gt=0)
         .order_by('tag')  # Добавили сортировку по полю 'name'
     )
-    return {'tags': tags}
+    return render_to_string('notes/list_tags.html', {'tags': tags})
+
+
+@register.simple_tag
+def show_categories(cat_selected=0) -> SafeString:
+    # Выбранная категория подсвечивается, поэтому фрагмент кэшируется для каждой отдельно
+    return get_fragment(SIDEBAR, f'categories:{cat_selected}', lambda: _render_categories(cat_selected))
+
+
+@register.simple_tag
+def show_all_tags() -> SafeString:
+    return get_fragment(SIDEBAR, 'tags', _render_tags)
@@ -0,0 +1,283 @@
+import itertools
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from choocha.metrics import registry
+from . import related, slugs
+from .admin import NotesAdmin
+from .cache import SIDEBAR, get_generation
+from .models import Note, TagPost, Category
+from .text import sanitize_html
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Манифест статики создаёт collectstatic, а тесты идут с DEBUG = False
+TEST_STORAGES = {**settings.STORAGES,
+                 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=TEST_STORAGES, QUERY_BUDGET_RAISE=True)
+class PublicPagesQueryCountTest(TestCase):
+    """
+    Число запросов публичных страниц не должно зависеть от числа статей на странице.
+    Кэш очищается перед каждым запросом: считаются запросы страницы, собираемой с нуля.
+    """
+    numbers = itertools.count()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user('author', 'author@example.com', 'password')
+        cls.category = Category.objects.create(name='Python')
+        cls.tags = [TagPost.objects.create(tag=f'tag {i}') for i in range(3)]
+        cls.post = cls.create_notes(1)[0]
+
+    @classmethod
+    def create_notes(cls, count: int) -> list[Note]:
+        notes = []
+        for _ in range(count):
+            note = Note.objects.create(
+                title=f'Note {next(cls.numbers)}',
+                content_short='<p>Краткий текст</p>',
+                content_full='<p>Полный текст</p>',
+                cat=cls.category,
+                author=cls.author,
+                is_published=Note.Status.PUBLISHED,
+            )
+            note.tags.set(cls.tags)
+            notes.append(note)
+        return notes
+
+    def assertConstantQueries(self, url: str, expected: int, user=None) -> None:
+        # Сначала одна статья, затем полная страница: N+1 дал бы разное число запросов
+        for count in (0, 7):
+            self.create_notes(count)
+            cache.clear()
+            Site.objects.clear_cache()
+            # Карты слагов живут в процессе дольше запроса; считаются запросы с уже загруженной картой
+            slugs.categories.reload()
+            slugs.tags.reload()
+            if user is not None:
+                # Сессии хранятся в кэше (choocha.sessions) и очищаются вместе с ним
+                self.client.force_login(user)
+            with self.subTest(notes=Note.objects.count()), self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assertConstantQueries(reverse('home'), 5)
+
+    def test_category(self):
+        self.assertConstantQueries(reverse('category', kwargs={'cat_slug': self.category.slug}), 5)
+
+    def test_tag(self):
+        self.assertConstantQueries(reverse('tag', kwargs={'tag_slug': self.tags[0].slug}), 5)
+
+    def test_unknown_category_and_tag(self):
+        # Один поиск слага в базе (промах запоминается), без подсчёта и выборки статей.
+        # Только что загруженные карты в базе не перепроверяются, поэтому они "стареют"
+        for slug_map in (slugs.categories, slugs.tags):
+            slug_map.reload()
+            slug_map._loaded_at -= slugs.SLUG_MISS_TTL
+        for url in (reverse('category', kwargs={'cat_slug': 'missing'}), reverse('tag', kwargs={'tag_slug': 'missing'})):
+            cache.clear()
+            with self.subTest(url=url):
+                # Шаблон 404 выводит боковую панель: ещё два запроса
+                with self.assertNumQueries(3):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+
+    def test_post(self):
+        self.assertConstantQueries(self.post.get_absolute_url(), 6)
+
+    def test_search(self):
+        self.assertConstantQueries(reverse('search') + '?q=note', 4)
+
+    def test_feed(self):
+        self.assertConstantQueries(reverse('feed'), 3)
+
+    def test_feed_is_cached_per_scheme(self):
+        cache.clear()
+        http = self.client.get(reverse('feed'))
+        https = self.client.get(reverse('feed'), secure=True)
+        self.assertIn(b'http://', http.content)
+        self.assertIn(b'https://', https.content)
+        self.assertNotEqual(http['ETag'], https['ETag'])
+
+    def test_authenticated_home(self):
+        self.assertConstantQueries(reverse('home'), 7, user=self.author)
+
+    def test_authenticated_post(self):
+        self.assertConstantQueries(self.post.get_absolute_url(), 8, user=self.author)
+
+
+class SlugMapTest(TestCase):
+    def test_renamed_category_is_reloaded_after_commit(self):
+        category = Category.objects.create(name='Python')
+        slugs.categories.reload()
+        self.assertEqual(slugs.categories.get(category.slug).name, 'Python')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.filter(pk=category.pk).update(name='Django')
+            category.refresh_from_db()
+            category.save()
+        self.assertEqual(slugs.categories.get(category.slug), slugs.SlugEntry(category.pk, 'Django'))
+
+    def test_missing_slug_is_looked_up_in_database(self):
+        slugs.tags.reload()
+        # Метка создана в другом процессе: сигнал этого процесса карту не сбрасывал
+        TagPost.objects.bulk_create([TagPost(tag='orm', slug='orm')])
+        # Только что загруженная карта в базе не перепроверяется
+        with self.assertNumQueries(0):
+            self.assertIsNone(slugs.tags.get('orm'))
+        slugs.tags._loaded_at -= slugs.SLUG_MISS_TTL
+        self.assertEqual(slugs.tags.get('orm').name, 'orm')
+        self.assertIsNone(slugs.tags.get('missing'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(slugs.tags.get('missing'))
+
+    def test_misses_are_bounded(self):
+        slugs.tags.reload()
+        slugs.tags._loaded_at -= slugs.SLUG_MISS_TTL
+        for number in range(slugs.SLUG_MISS_LIMIT + 10):
+            slugs.tags.get(f'missing-{number}')
+        self.assertLessEqual(len(slugs.tags._misses), slugs.SLUG_MISS_LIMIT)
+
+
+class SanitizeHtmlTest(SimpleTestCase):
+    def test_unsafe_urls_and_styles_are_removed(self):
+        html = ('<a href="java&#9;script:alert(1)">1</a><a href=" \x01javascript:alert(1)">2</a>'
+                '<a href="JaVa\nScRiPt&colon;alert(1)">3</a><img src="data:image/svg+xml;base64,PHN2Zz4=">'
+                '<p style="position:fixed">4</p>')
+        self.assertEqual(sanitize_html(html), '<a>1</a><a>2</a><a>3</a><img/><p>4</p>')
+
+    def test_safe_urls_are_kept(self):
+        html = ('<a href="https://example.com/?q=a:b">1</a><a href="mailto:me@example.com">2</a>'
+                '<a href="/post/note:1/">3</a><img src="//example.com/i.png"/>')
+        self.assertEqual(sanitize_html(html), html)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RelatedRecomputeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.tag = TagPost.objects.create(tag='orm')
+
+    def create_note(self, title: str) -> Note:
+        note = Note.objects.create(title=title, cat=self.category, is_published=Note.Status.PUBLISHED)
+        note.tags.add(self.tag)
+        return note
+
+    def test_rolled_back_schedule_is_discarded(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                related.schedule([1])
+                raise ValueError
+            related.schedule([2])
+        self.assertEqual([callback.args for callback in callbacks], [(frozenset({2}), True)])
+
+    def test_note_is_recomputed_once_per_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            note = self.create_note('Первая')
+        with mock.patch.object(related, 'recompute', return_value=set()) as recompute:
+            for callback in callbacks:
+                callback()
+        # Сохранение статьи и добавление метки запланировали её дважды
+        self.assertGreater(len(callbacks), 1)
+        recompute.assert_called_once_with(note.pk, True)
+
+    def test_cascade_is_bounded(self):
+        with self.captureOnCommitCallbacks():
+            for number in range(related.CASCADE_LIMIT + 10):
+                self.create_note(f'Статья {number}')
+            note = self.create_note('Новая')
+        with mock.patch.object(related, 'recompute', wraps=related.recompute) as recompute:
+            related.recompute(note.pk)
+        self.assertEqual(recompute.call_count, 1 + related.CASCADE_LIMIT)
+
+    def test_bulk_status_change_skips_cascade(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notes = [self.create_note(f'Статья {number}') for number in range(3)]
+        self.assertTrue(notes[2].related_links.filter(related__in=notes[:2]).exists())
+        with mock.patch.object(related, 'recompute', wraps=related.recompute) as recompute, \
+                self.captureOnCommitCallbacks(execute=True):
+            NotesAdmin._set_status(Note.objects.filter(pk__in=[note.pk for note in notes[:2]]), Note.Status.DRAFT)
+        self.assertEqual(recompute.call_args_list, [mock.call(note.pk, False) for note in notes[:2]])
+        # Снятые с публикации статьи пропали из списка оставшейся без её пересчёта
+        self.assertFalse(notes[2].related_links.filter(related__in=notes[:2]).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SidebarInvalidationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.tag = TagPost.objects.create(tag='orm')
+
+    def assertSidebarBumped(self, bumped: bool, change) -> None:
+        before = get_generation(SIDEBAR)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(get_generation(SIDEBAR) != before, bumped)
+
+    def test_draft_does_not_touch_sidebar(self):
+        draft = Note(title='Черновик', cat=self.category)
+        self.assertSidebarBumped(False, draft.save)
+        self.assertSidebarBumped(False, lambda: draft.tags.add(self.tag))
+        self.assertSidebarBumped(False, lambda: self.tag.notes.remove(draft))
+        draft.is_published = Note.Status.PUBLISHED
+        self.assertSidebarBumped(True, draft.save)
+        self.assertSidebarBumped(True, lambda: draft.tags.add(self.tag))
+        self.assertSidebarBumped(False, draft.save)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=TEST_STORAGES)
+class AdminSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.note = Note.objects.create(title='Кэширование страниц', content_full='<p>Поколения ключей</p>',
+                                       cat=Category.objects.create(name='Django'))
+        Note.objects.create(title='Другая статья', cat=Category.objects.create(name='Python'))
+
+    def test_text_title_substring_and_category(self):
+        self.client.force_login(self.admin)
+        for term in ('поколения', 'широван', 'djan'):
+            with self.subTest(term=term):
+                response = self.client.get(reverse('admin:notes_note_changelist'), {'q': term})
+                self.assertEqual([note.pk for note in response.context['cl'].result_list], [self.note.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=TEST_STORAGES, PERF_METRICS_SAMPLE_RATE=1.0,
+                   PERF_SERVER_TIMING=True, PERF_METRICS_TOKEN='secret')
+class PerformanceMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_server_timing_only_for_staff(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+        staff = get_user_model().objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'], r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+
+    def test_metrics(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        metrics = response.content.decode()
+        self.assertIn('choocha_http_responses_total{view="home",method="GET",status="200"} 1', metrics)
+        self.assertIn('choocha_http_request_duration_seconds_count{view="home"} 1', metrics)
+
+    def test_metrics_require_token(self):
+        # Тестовый клиент приходит с 127.0.0.1, как и запросы через nginx
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 404)
+        with self.settings(PERF_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
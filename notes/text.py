@@ -0,0 +1,71 @@
+# choocha\notes\text.py
+import re
+from html import unescape
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+# Теги, которые может выдать CKEditor в кратком тексте статьи
+ALLOWED_TAGS = {
+    'p', 'br', 'b', 'strong', 'i', 'em', 'u', 's', 'sub', 'sup', 'mark', 'span', 'a', 'code', 'pre',
+    'blockquote', 'ul', 'ol', 'li', 'h2', 'h3', 'h4', 'figure', 'figcaption', 'img',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {'href', 'src', 'alt', 'title', 'class', 'width', 'height', 'colspan', 'rowspan'}
+# Содержимое этих тегов выбрасывается целиком, остальные неизвестные теги разворачиваются
+DROPPED_TAGS = ('script', 'style', 'iframe', 'object', 'embed', 'form', 'input', 'button', 'textarea', 'select')
+# Схемы ссылок и изображений; адреса без схемы (относительные) тоже разрешены
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Браузер отбрасывает управляющие символы и пробелы в схеме: "java\tscript:" остаётся javascript:
+URL_IGNORED_CHARS = re.compile(r'[\x00-\x20]+')
+WHITESPACE = re.compile(r'\s+')
+TAG = re.compile(r'<[^>]*>')
+DESCRIPTION_LENGTH = 160
+
+
+def sanitize_html(html: str | None) -> str:
+    """Оставляет в HTML только разрешённые теги и атрибуты."""
+    if not html:
+        return ''
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup.find_all(DROPPED_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        if tag.name not in ALLOWED_TAGS:
+            tag.unwrap()
+            continue
+        for attr in list(tag.attrs):
+            if attr not in ALLOWED_ATTRIBUTES or (attr in ('href', 'src') and not is_safe_url(tag[attr])):
+                del tag[attr]
+    return str(soup).strip()
+
+
+def is_safe_url(url: str) -> bool:
+    """Адрес относительный или со схемой из SAFE_URL_SCHEMES."""
+    try:
+        return urlsplit(URL_IGNORED_CHARS.sub('', url)).scheme.lower() in SAFE_URL_SCHEMES
+    except ValueError:
+        return False
+
+
+def html_to_text(html: str | None) -> str:
+    """Извлекает из HTML текст с нормализованными пробелами."""
+    if not html:
+        return ''
+    text = BeautifulSoup(html, 'html.parser').get_text(' ')
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def strip_tags_fast(html: str | None) -> str:
+    """
+    Быстрое извлечение текста регулярным выражением, без построения дерева.
+    Используется только как запасной вариант для записей без готового описания.
+    """
+    if not html:
+        return ''
+    return WHITESPACE.sub(' ', unescape(TAG.sub(' ', html))).strip()
+
+
+def build_description(meta_description: str | None, text: str) -> str:
+    """Описание страницы: заданное автором метаописание или начало текста анонса."""
+    return ((meta_description or '').strip() or text)[:DESCRIPTION_LENGTH]
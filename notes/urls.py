@@ -1,15 +1,31 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, feeds, views
+
+if settings.ASYNC_PUBLIC_VIEWS:
+    note_home, show_post = async_views.note_home, async_views.show_post
+    notes_category, notes_tags = async_views.notes_category, async_views.notes_tags
+else:
+    note_home, show_post = views.NoteHome.as_view(), views.ShowPost.as_view()
+    notes_category, notes_tags = views.NotesCategory.as_view(), views.NotesTags.as_view()
 
 urlpatterns = [
-    path('', views.NoteHome.as_view(), name='home'),
+    path('', note_home, name='home'),
     path('about/', views.AboutView.as_view(), name='about'),
     path('addpost/', views.AddPost.as_view(), name='add_post'),
     path('contact/', views.ContactView.as_view(), name='contact'),
-    path('post/<slug:post_slug>/', views.ShowPost.as_view(), name='post'),
-    path('category/<slug:cat_slug>/', views.NotesCategory.as_view(), name='category'),
-    path('tag/<slug:tag_slug>/', views.NotesTags.as_view(), name='tag'),
+    path('post/<slug:post_slug>/', show_post, name='post'),
+    path('category/<slug:cat_slug>/', notes_category, name='category'),
+    path('tag/<slug:tag_slug>/', notes_tags, name='tag'),
+    path('feed/', feeds.latest_rss, name='feed'),
+    path('feed/atom/', feeds.latest_atom, name='feed_atom'),
+    path('category/<slug:cat_slug>/feed/', feeds.category_rss, name='category_feed'),
+    path('category/<slug:cat_slug>/feed/atom/', feeds.category_atom, name='category_feed_atom'),
+    path('tag/<slug:tag_slug>/feed/', feeds.tag_rss, name='tag_feed'),
+    path('tag/<slug:tag_slug>/feed/atom/', feeds.tag_atom, name='tag_feed_atom'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
     path('update/<int:pk>/', views.UpdatePost.as_view(), name='update_post'),
     path('delete/<int:pk>/', views.DeletePost.as_view(), name='delete_post'),
 
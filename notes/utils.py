@@ -1,3 +1,8 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import Http404
+
+from .pagination import ApproximateCountPaginator, CursorPaginator
 
 
 class DataMixin:
@@ -6,8 +11,41 @@ class DataMixin:
 
     @staticmethod
     def get_mixin_context(context: dict, **kwargs) -> dict:
-        if "paginator" in context and "page_obj" in context:
+        if "paginator" in context and "page_obj" in context and not getattr(context["page_obj"], "is_cursor", False):
             context["page_range"] = context["paginator"].get_elided_page_range(context["page_obj"].number,
                                                                                on_each_side=2, on_ends=1)
         context.update({**kwargs})
         return context
+
+
+class NotesPaginationMixin:
+    """
+    Выбор способа пагинации для списков статей.
+    pagination_mode: 'offset' (номера страниц) или 'cursor' (?after=/?before=);
+    count_mode: 'exact', 'cached' или 'estimate' - как считать страницы в режиме 'offset'.
+    """
+    pagination_mode = None
+    count_mode = None
+
+    def get_pagination_mode(self) -> str:
+        return self.pagination_mode or settings.NOTES_PAGINATION_MODE
+
+    def get_count_mode(self) -> str:
+        return self.count_mode or settings.NOTES_PAGINATION_COUNT
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        count_mode = self.get_count_mode()
+        if count_mode == 'exact':
+            return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        return ApproximateCountPaginator(queryset, per_page, orphans=orphans,
+                                         allow_empty_first_page=allow_empty_first_page, count_mode=count_mode, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except InvalidPage as e:
+            raise Http404(f'Неверная страница: {e}')
+        return paginator, page, page.object_list, page.has_other_pages()
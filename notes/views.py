@@ -1,25 +1,50 @@
 from typing import Any
 
-from bs4 import BeautifulSoup
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
+from django.http import HttpRequest, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_safe
 from django.views.generic import TemplateView, ListView, DetailView, CreateView, DeleteView, UpdateView
 
+from . import autocomplete
+from .conditional import (conditional_page, home_last_modified, post_last_modified, category_last_modified,
+                          tag_last_modified)
 from .forms import AddPostForm, UpdatePostForm
-from .models import Note, TagPost, Category
-from .utils import DataMixin
+from .models import Note, TagPost, RelatedNote
+from .search import search_notes
+from .slugs import get_category_or_404, get_tag_or_404
+from .text import build_description, strip_tags_fast
+from .utils import DataMixin, NotesPaginationMixin
 
+# Колонки, которые выводит index.html: тексты CKEditor в списки не загружаются
+LIST_FIELDS = ('title', 'slug', 'image', 'image_width', 'image_height', 'time_create', 'time_update', 'excerpt_html', 'cat__name', 'author__username')
 
-class NoteHome(DataMixin, ListView):
+
+def published_list() -> QuerySet:
+    return Note.published.select_related('cat', 'author').only(*LIST_FIELDS)
+
+
+def published_post() -> QuerySet:
+    # Метки из show_post.html выбираются одним запросом вместе со статьёй, tsvector для показа не нужен
+    return Note.published.defer('search_vector').prefetch_related(
+        Prefetch('tags', queryset=TagPost.objects.only('tag', 'slug'))
+    )
+
+
+@method_decorator(conditional_page(home_last_modified), name='dispatch')
+class NoteHome(NotesPaginationMixin, DataMixin, ListView):
     template_name = 'notes/index.html'
     context_object_name = 'posts'
     paginate_by = 5
 
     def get_queryset(self) -> QuerySet:
-        return Note.published.all().select_related('cat', 'author')
+        return published_list()
 
     def get_context_data(self, **kwargs) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
@@ -28,6 +53,7 @@ class NoteHome(DataMixin, ListView):
         return self.get_mixin_context(context, title='Главная страница', cat_selected=0)
 
 
+@method_decorator(conditional_page(post_last_modified), name='dispatch')
 class ShowPost(DataMixin, DetailView):
     # model = Notes #Не использовать этот способ, если определен get_queryset
     template_name = 'notes/show_post.html'
@@ -35,7 +61,7 @@ class ShowPost(DataMixin, DetailView):
     context_object_name = 'post'
 
     def get_queryset(self) -> QuerySet:
-        return Note.published.all()
+        return published_post()
 
     def get_object(self, queryset: QuerySet = None) -> QuerySet:
         return get_object_or_404(queryset or self.get_queryset(), slug=self.kwargs[self.slug_url_kwarg])
@@ -44,46 +70,93 @@ class ShowPost(DataMixin, DetailView):
         context = super().get_context_data(**kwargs)
 
         post = context['post']  # получаем пост из контекста
-        if post.meta_description and post.meta_description.strip():
-            context['page_description'] = post.meta_description
-        else:
-            soup = BeautifulSoup(post.content_short, features="html5lib")  # Используем lxml для обработки HTML
-            clean_text = soup.get_text(strip=True)  # Извлекаем текст и убираем лишние пробелы
-            context['page_description'] = clean_text[:160]
-            context['page_description_name'] = 'description'
+        # Описание вычисляется при сохранении; для ещё не заполненных записей - быстрый разбор без html5lib
+        context['page_description'] = post.description or build_description(
+            post.meta_description, strip_tags_fast(post.content_short)
+        )
+        context['page_description_name'] = 'description'
+        # Похожие статьи вычислены заранее (notes.related): один запрос по индексу (note, position)
+        context['related_links'] = (RelatedNote.objects.filter(note=post, related__is_published=True)
+                                    .select_related('related').only('related__title', 'related__slug'))
         return self.get_mixin_context(context, title=context['post'].title)
 
 
-class NotesCategory(DataMixin, ListView):
+@method_decorator(conditional_page(category_last_modified), name='dispatch')
+class NotesCategory(NotesPaginationMixin, DataMixin, ListView):
     template_name = 'notes/index.html'
     context_object_name = 'posts'
     paginate_by = 5
 
+    def get(self, request, *args, **kwargs):
+        # Категория берётся из карты слагов до выборки статей: неизвестный слаг - 404 без запросов списка
+        self.category = get_category_or_404(self.kwargs['cat_slug'])
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self) -> QuerySet:
-        return Note.published.filter(cat__slug=self.kwargs['cat_slug']).select_related('cat')
+        return published_list().filter(cat_id=self.category.pk)
 
     def get_context_data(self, **kwargs) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        category = get_object_or_404(Category, slug=self.kwargs['cat_slug'])
+        category = self.category
         context['page_description'] = f'Все статьи из категории {category.name}'
         context['page_description_name'] = 'description'
         return self.get_mixin_context(context, cat_selected=category.pk, title='Категория: ' + category.name)
 
 
-class NotesTags(DataMixin, ListView):
+@method_decorator(conditional_page(tag_last_modified), name='dispatch')
+class NotesTags(NotesPaginationMixin, DataMixin, ListView):
     template_name = 'notes/index.html'
     context_object_name = 'posts'
     paginate_by = 5
 
+    def get(self, request, *args, **kwargs):
+        self.tag = get_tag_or_404(self.kwargs['tag_slug'])
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self) -> QuerySet:
-        return Note.published.filter(tags__slug=self.kwargs['tag_slug']).select_related('cat')
+        # Условие по связующей таблице, без соединения с notes_tagpost
+        return published_list().filter(tags=self.tag.pk)
 
     def get_context_data(self, **kwargs) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        tag = get_object_or_404(TagPost, slug=self.kwargs['tag_slug'])
-        context['page_description'] = f'Все статьи с тэгом {tag.tag}'
+        context['page_description'] = f'Все статьи с тэгом {self.tag.name}'
         context['page_description_name'] = 'description'
-        return self.get_mixin_context(context, title='Тег: ' + tag.tag)
+        return self.get_mixin_context(context, title='Тег: ' + self.tag.name)
+
+
+class SearchView(DataMixin, ListView):
+    template_name = 'notes/search.html'
+    context_object_name = 'posts'
+    paginate_by = 5
+    max_query_length = 200
+
+    def get_search_query(self) -> str:
+        return self.request.GET.get('q', '').strip()[:self.max_query_length]
+
+    def get_queryset(self) -> QuerySet:
+        query = self.get_search_query()
+        if not query:
+            return Note.objects.none()
+        return search_notes(published_list(), query, headline=True)
+
+    def get_context_data(self, **kwargs) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        query = self.get_search_query()
+        context['query'] = query
+        context['page_description'] = 'noindex, follow'
+        context['page_description_name'] = 'robots'
+        return self.get_mixin_context(context, title=f'Поиск: {query}' if query else 'Поиск')
+
+
+@require_safe
+def autocomplete_view(request: HttpRequest) -> JsonResponse:
+    """Подсказки для полей ввода: ?q=строка&source=notes|tags|categories."""
+    source = request.GET.get('source', 'notes')
+    if source not in autocomplete.SOURCES:
+        return JsonResponse({'error': 'Неизвестный источник подсказок'}, status=400)
+    response = JsonResponse({'results': autocomplete.find(source, request.GET.get('q', ''))})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 
 class AddPost(PermissionRequiredMixin, DataMixin, CreateView):
@@ -102,7 +175,9 @@ class AddPost(PermissionRequiredMixin, DataMixin, CreateView):
     def form_valid(self, form):
         post = form.save(commit=False)
         post.author = self.request.user
-        return super().form_valid(form)
+        # Статья и её метки сохраняются одной транзакцией: похожие статьи пересчитываются один раз после фиксации
+        with transaction.atomic():
+            return super().form_valid(form)
 
 
 class DeletePost(PermissionRequiredMixin, DataMixin, DeleteView):
@@ -147,7 +222,9 @@ class UpdatePost(PermissionRequiredMixin, DataMixin, UpdateView):
     def form_valid(self, form):
         post = form.save(commit=False)
         post.author = self.request.user
-        return super().form_valid(form)
+        # Статья и её метки сохраняются одной транзакцией: похожие статьи пересчитываются один раз после фиксации
+        with transaction.atomic():
+            return super().form_valid(form)
 
 
 class AboutView(DataMixin, TemplateView):
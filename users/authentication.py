@@ -1,22 +1,97 @@
 from django.contrib.auth import get_user_model
-from django.core.mail.backends.base import BaseEmailBackend
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+from django.db.models.functions import Lower
+from django.utils.crypto import salted_hmac
+from social_core.backends.github import GithubOAuth2
 
+from .permissions import get_user_permissions
 
-class EmailAuthBackend(BaseEmailBackend):
+SNAPSHOT_TIMEOUT = 60 * 60
+# Хэш пароля в кэш не попадает: вместо него хранится производный от него хэш сессии
+SNAPSHOT_EXCLUDED_FIELDS = {'password'}
+
+
+def users_by_email(email: str) -> QuerySet:
+    """Поиск без учёта регистра по индексу LOWER(email) (ограничение user_email_ci_unique)."""
+    return get_user_model()._default_manager.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
+def snapshot_fields() -> list[str]:
+    return [field.attname for field in get_user_model()._meta.concrete_fields
+            if field.attname not in SNAPSHOT_EXCLUDED_FIELDS]
 
-    def authenticate(self, request, username=None, password=None, **kwargs):
-        user_model = get_user_model()
-        try:
-            user = user_model.objects.get(email=username)
-            if user.check_password(password):
-                return user
-            return None
-        except (user_model.DoesNotExist, user_model.MultipleObjectsReturned):
-            return None
+
+def snapshot_key(user_id) -> str:
+    # Версия в ключе меняется вместе с набором полей (снимки до миграции не читаются)
+    # и с SECRET_KEY, от которого зависит хранимый хэш сессии
+    version = salted_hmac('users.authentication.snapshot', ','.join(snapshot_fields())).hexdigest()[:16]
+    return f'users:snapshot:{version}:{user_id}'
+
+
+def forget_user_snapshot(user_id) -> None:
+    cache.delete(snapshot_key(user_id))
+
+
+class CachedUserBackendMixin:
+    """
+    get_user вызывается AuthenticationMiddleware в каждом запросе авторизованного пользователя.
+    Строка пользователя хранится в кэше как словарь {attname: значение} без пароля вместе с хэшем
+    сессии (см. User.get_session_auth_hash) и сбрасывается при любом сохранении пользователя.
+    """
 
     def get_user(self, user_id):
-        user_model = get_user_model()
-        try:
-            return user_model.objects.get(pk=user_id)
-        except user_model.DoesNotExist:
+        key = snapshot_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            values, session_auth_hash = snapshot
+            # Пароль остаётся отложенным полем: сохранение такого объекта его не перезапишет
+            user = get_user_model().from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+            user._session_auth_hash = session_auth_hash
+            can_authenticate = getattr(self, 'user_can_authenticate', None)
+            return user if can_authenticate is None or can_authenticate(user) else None
+
+        user = super().get_user(user_id)
+        if user is not None:
+            values = {name: getattr(user, name) for name in snapshot_fields()}
+            cache.set(key, (values, user.get_session_auth_hash()), SNAPSHOT_TIMEOUT)
+        return user
+
+
+class CachedPermissionsMixin:
+    """Права для has_perm берутся из users.permissions, а не собираются запросами к группам."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if obj is not None or not user_obj.is_active or user_obj.is_anonymous:
+            return super().get_all_permissions(user_obj, obj=obj)
+        # Кэш на объекте пользователя общий с ModelBackend: остальные бэкенды не повторяют загрузку
+        if not hasattr(user_obj, '_perm_cache'):
+            user_obj._perm_cache = get_user_permissions(user_obj)
+        return user_obj._perm_cache
+
+
+class CachedModelBackend(CachedUserBackendMixin, CachedPermissionsMixin, ModelBackend):
+    pass
+
+
+class CachedGithubOAuth2(CachedUserBackendMixin, GithubOAuth2):
+    # Имя бэкенда 'github' наследуется, адреса social_django не меняются
+    pass
+
+
+class EmailAuthBackend(CachedUserBackendMixin, CachedPermissionsMixin, ModelBackend):
+    """Вход по email вместо логина."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None or password is None:
+            return None
+        user = users_by_email(username).first()
+        if user is None:
+            # Хэшируем пароль и для несуществующего email, чтобы время ответа не выдавало наличие адреса
+            get_user_model()().set_password(password)
             return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
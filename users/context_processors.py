@@ -1,25 +1,51 @@
 #choocha/users/context_processors.py
-menu = [{'title': "О сайте", 'url_name': 'about', 'for_all': True, },
-        {'title': "Добавить статью", 'url_name': 'add_post', 'for_moderator': True},
-        {'title': "Обратная связь", 'url_name': 'contact', 'for_all': True},
-        {'title': "Войти", 'url_name': 'users:login', 'title2': "Регистрация", 'url_name2': 'users:register',
-         'for_anonymous': True},
-        {'title': "", 'url_name': "users:profile", 'title2': "Выйти", 'url_name2': 'users:logout',
-         'for_authorized': True},
-        ]
+from functools import cache
+from typing import NamedTuple
+
+from django.urls import reverse
+
+from .permissions import get_user_permissions
+
+
+class MenuItem(NamedTuple):
+    title: str
+    url: str
+    title2: str = ''
+    url2: str = ''
+    greeting: bool = False  # Вместо title выводится приветствие с именем пользователя
+
+
+ABOUT = ("О сайте", 'about')
+ADD_POST = ("Добавить статью", 'add_post')
+CONTACT = ("Обратная связь", 'contact')
+LOGIN = ("Войти", 'users:login', "Регистрация", 'users:register')
+PROFILE = ("", 'users:profile', "Выйти", 'users:logout', True)
+
+# Пункты меню для каждой роли, в порядке вывода
+ROLES = {
+    'anonymous': (ABOUT, CONTACT, LOGIN),
+    'authorized': (ABOUT, CONTACT, PROFILE),
+    'moderator': (ABOUT, ADD_POST, CONTACT, PROFILE),
+}
+
+
+def _item(title: str, url_name: str, title2: str = '', url_name2: str = '', greeting: bool = False) -> MenuItem:
+    return MenuItem(title, reverse(url_name), title2, reverse(url_name2) if url_name2 else '', greeting)
+
+
+@cache
+def get_menus() -> dict[str, tuple[MenuItem, ...]]:
+    """Меню всех ролей с готовыми адресами. Строится один раз на процесс и не изменяется."""
+    return {role: tuple(_item(*item) for item in items) for role, items in ROLES.items()}
 
 
 def get_notes_menu_context(request):
-    result_menu = []
-    for item in menu:
-        if 'for_all' in item:
-            result_menu.append(item)
-        elif 'for_moderator' in item and request.user.has_perm('notes.add_note'):
-            result_menu.append(item)
-        elif 'for_anonymous' in item and request.user.is_anonymous:
-            result_menu.append(item)
-        elif 'for_authorized' in item and request.user.is_authenticated:
-            result_menu.append(item)
-    if request.user.is_authenticated:
-        result_menu[-1]['title'] = f'Добро пожаловать, {request.user.username}'
-    return {'mainmenu': result_menu}
+    user = request.user
+    if not user.is_authenticated:
+        role = 'anonymous'
+    elif 'notes.add_note' in get_user_permissions(user):
+        role = 'moderator'
+    else:
+        role = 'authorized'
+    # Имя передаётся отдельно: общие для всех запросов кортежи меню не содержат данных пользователя
+    return {'mainmenu': get_menus()[role], 'menu_username': user.username if user.is_authenticated else ''}
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from choocha.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Переносит действующие сессии из django_session в кэш (choocha.sessions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help='Удалить перенесённые и просроченные сессии из базы')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        moved = 0
+        sessions = Session.objects.filter(expire_date__gt=now).order_by('pk')
+        for session in sessions.iterator(chunk_size=1000):
+            store = SessionStore(session.session_key)
+            data = store.decode(session.session_data)
+            if not data:
+                continue
+            # Срок в кэше - оставшееся время жизни сессии, а не полный SESSION_COOKIE_AGE
+            store._cache.set(store.cache_key, data, int((session.expire_date - now).total_seconds()))
+            moved += 1
+
+        if options['delete']:
+            # При SESSION_WRITE_THROUGH таблица остаётся копией кэша: удаляются только просроченные
+            stale = Session.objects.filter(expire_date__lte=now) if settings.SESSION_WRITE_THROUGH else Session.objects.all()
+            deleted, _ = stale.delete()
+            self.stdout.write(f'Удалено из базы: {deleted}')
+        self.stdout.write(self.style.SUCCESS(f'Перенесено сессий: {moved}'))
+
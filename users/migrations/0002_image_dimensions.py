@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+from notes.images import image_dimensions
+
+
+def fill_dimensions(apps, schema_editor):
+    # Отсутствующие и повреждённые файлы оставляют размеры пустыми
+    User = apps.get_model('users', 'User')
+    objects = list(User.objects.exclude(photo='').exclude(photo__isnull=True).only('pk', 'photo'))
+    for obj in objects:
+        obj.photo_width, obj.photo_height = image_dimensions(obj.photo)
+    User.objects.bulk_update(objects, ['photo_width', 'photo_height'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фотографии'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фотографии'),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+    ]
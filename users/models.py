@@ -1,7 +1,39 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
+
+from notes.images import image_dimensions, dimensions_outdated
+
 
 # Create your models here.
 class User(AbstractUser):
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Вход по email (users.authentication.EmailAuthBackend) ищет по LOWER(email).
+            # Пустой email допустим у нескольких пользователей, например, пришедших через GitHub
+            models.UniqueConstraint(Lower('email'), condition=~models.Q(email=''), name='user_email_ci_unique'),
+        ]
+
     photo = models.ImageField(upload_to='users/%Y/%m/%d', blank=True, null=True, verbose_name='Фотография')
+    # Размеры фотографии хранятся в строке, чтобы шаблоны не открывали файл
+    photo_width = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name='Ширина фотографии')
+    photo_height = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name='Высота фотографии')
     date_birth = models.DateField(blank=True, null=True, verbose_name='Дата рождения')
+
+    def save(self, *args, **kwargs) -> None:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'photo' not in update_fields:
+            # Например, обновление last_login при входе: фотография не менялась
+            return super().save(*args, **kwargs)
+        if 'photo' not in self.get_deferred_fields() and dimensions_outdated(self.photo, self.photo_width):
+            self.photo_width, self.photo_height = image_dimensions(self.photo)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'photo_width', 'photo_height'}
+        super().save(*args, **kwargs)
+
+    def get_session_auth_hash(self) -> str:
+        # У пользователя из снимка кэша (users.authentication) пароль не загружен, а хэш сессии уже посчитан.
+        # После set_password пароль загружен, и хэш считается заново
+        if 'password' in self.get_deferred_fields() and hasattr(self, '_session_auth_hash'):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
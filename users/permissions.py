@@ -0,0 +1,49 @@
+# choocha/users/permissions.py
+import time
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+PERMISSIONS_TIMEOUT = 60 * 60 * 24
+# Поколение всех наборов прав: увеличивается при изменении прав групп, которые затрагивают многих пользователей
+GENERATION_KEY = 'users:permissions:generation'
+
+
+def permissions_key(user_pk: int) -> str:
+    return f'users:permissions:{user_pk}'
+
+
+def get_user_permissions(user) -> frozenset[str]:
+    """
+    Все права пользователя ('app_label.codename') из кэша. ModelBackend собирает их двумя запросами
+    (личные права и права групп) в каждом запросе заново; здесь это происходит один раз до изменения прав.
+    """
+    if not user.is_active or user.is_anonymous:
+        return frozenset()
+    key = permissions_key(user.pk)
+    found = cache.get_many([key, GENERATION_KEY])
+    generation = found.get(GENERATION_KEY)
+    if generation is None:
+        # Как в notes.cache.get_generations: после вытеснения ключа поколение начинается со времени,
+        # а не с нуля, иначе старые наборы прав, записанные при нулевом поколении, снова стали бы верными
+        generation = time.time_ns()
+        if not cache.add(GENERATION_KEY, generation, timeout=None):
+            generation = cache.get(GENERATION_KEY, generation)
+    entry = found.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    # Напрямую через ModelBackend: бэкенды из users.authentication сами читают права отсюда
+    permissions = frozenset(ModelBackend().get_all_permissions(user))
+    cache.set(key, (generation, permissions), PERMISSIONS_TIMEOUT)
+    return permissions
+
+
+def forget_user_permissions(user_pks) -> None:
+    cache.delete_many([permissions_key(pk) for pk in user_pks])
+
+
+def forget_all_permissions() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
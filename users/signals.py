@@ -0,0 +1,50 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from notes.images import ensure_derivatives
+from .authentication import forget_user_snapshot
+from .models import User
+from .permissions import forget_user_permissions, forget_all_permissions
+
+
+@receiver(post_save, sender=User)
+def build_photo_derivatives(sender, instance: User, update_fields=None, **kwargs) -> None:
+    # Сохранения отдельных полей (например, last_login при входе) изображение не меняют
+    if (update_fields is None or 'photo' in update_fields) and 'photo' not in instance.get_deferred_fields():
+        ensure_derivatives(instance.photo)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_snapshot_on_user_change(sender, instance: User, **kwargs) -> None:
+    # Снимок содержит поля пользователя, включая last_login, и зависящий от пароля хэш сессии
+    forget_user_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_permissions_on_user_change(sender, instance: User, update_fields=None, **kwargs) -> None:
+    # is_active и is_superuser меняют права целиком; вход обновляет только last_login
+    if update_fields is None or {'is_active', 'is_superuser'} & set(update_fields):
+        forget_user_permissions([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def forget_permissions_on_assignment(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # group.user_set.clear() и permission.user_set.clear() не сообщают, кого затронули
+        forget_all_permissions()
+    else:
+        forget_user_permissions([instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver([post_save, post_delete], sender=Group)
+@receiver(post_delete, sender=Permission)
+def forget_permissions_on_group_change(sender, **kwargs) -> None:
+    if kwargs.get('action', 'post_').startswith('post_'):
+        forget_all_permissions()